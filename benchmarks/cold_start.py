@@ -0,0 +1,182 @@
+"""
+Холодный старт: сколько проходит от запуска процесса с yatube.wsgi
+до первого байта ответа и сколько стоят первые запросы к разным
+страницам. Каждый прогон - новый процесс в одном из вариантов:
+
+    plain   - загрузчики без кеша, без прогрева (как было);
+    cached  - cached.Loader, шаблоны компилируются первыми запросами;
+    warmup  - cached.Loader и core.warmup до того, как сервер готов
+              (так работает preload-сервер с WARMUP_ON_LOAD).
+
+С preload-сервером boot_ms платится один раз в мастере, а first_ms -
+каждым воркером после fork, так что для warmup важен first_ms;
+без preload прогрев окупается, только если cold_ms не растет.
+
+    python benchmarks/cold_start.py --db /tmp/cold.sqlite3 --runs 7
+"""
+import argparse
+import http.client
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import setup_django
+
+UNTIL = '2024-01-01'
+VARIANTS = ('plain', 'cached', 'warmup')
+METRICS = ('boot_ms', 'first_ms', 'cold_ms', 'other_pages_ms', 'steady_ms')
+STEADY_REPEAT = 20
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', help='файл SQLite; нет файла - сгенерировать')
+    parser.add_argument('--posts', type=int, default=10_000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument(
+        '--variants', nargs='+', choices=VARIANTS, default=list(VARIANTS))
+    parser.add_argument('--json', help='куда сохранить результаты')
+    parser.add_argument('--child', choices=VARIANTS, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def serve(variant, database):
+    """Дочерний процесс: поднимает сервер и сообщает порт."""
+    from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+    setup_django(
+        database, DEBUG=False, WARMUP_ON_LOAD=variant == 'warmup')
+    from django.conf import settings
+
+    loaders = [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]
+    if variant != 'plain':
+        loaders = [('django.template.loaders.cached.Loader', loaders)]
+    settings.TEMPLATES[0]['OPTIONS']['loaders'] = loaders
+
+    from yatube.wsgi import application
+
+    class Handler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = make_server('127.0.0.1', 0, application, handler_class=Handler)
+    print(f'ready {server.server_port}', flush=True)
+    server.serve_forever()
+
+
+def prepare_database(args, path):
+    from django.core.management import call_command
+
+    fresh = not os.path.exists(path)
+    setup_django(path)
+    if fresh:
+        call_command('migrate', verbosity=0)
+        print(f'Генерируем {args.posts} постов...')
+        call_command(
+            'seed', f'--until={UNTIL}', posts=args.posts,
+            users=max(10, args.posts // 50),
+            groups=max(5, args.posts // 2000), verbosity=0
+        )
+
+
+def sample_paths():
+    """Главная и по одной странице группы, профиля и поста."""
+    from django.urls import reverse
+
+    from posts.models import Group, Post
+
+    post = Post.objects.select_related('author').latest('pk')
+    group = Group.objects.order_by('-posts_count').first()
+    return [
+        reverse('posts:index'),
+        reverse('posts:group_list', args=(group.slug,)),
+        reverse('posts:profile', args=(post.author.username,)),
+        reverse('posts:post_detail', args=(post.pk,)),
+    ]
+
+
+def first_byte_ms(port, path):
+    """Время до статуса ответа, мс; тело дочитывается вне замера."""
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    started = time.perf_counter()
+    connection.request('GET', path)
+    response = connection.getresponse()
+    elapsed = (time.perf_counter() - started) * 1000
+    response.read()
+    connection.close()
+    if response.status != 200:
+        raise RuntimeError(f'{path}: ответ {response.status}')
+    return elapsed
+
+
+def cold_run(variant, database, paths):
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--child', variant,
+         '--db', database],
+        stdout=subprocess.PIPE, text=True)
+    try:
+        line = process.stdout.readline()
+        boot_ms = (time.perf_counter() - started) * 1000
+        if not line.startswith('ready '):
+            raise RuntimeError(f'{variant}: сервер не запустился')
+        port = int(line.split()[1])
+        first_ms = first_byte_ms(port, paths[0])
+        other_ms = sum(first_byte_ms(port, path) for path in paths[1:])
+        steady_ms = statistics.median(
+            first_byte_ms(port, paths[0]) for _ in range(STEADY_REPEAT))
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        'boot_ms': boot_ms,
+        'first_ms': first_ms,
+        'cold_ms': boot_ms + first_ms,
+        'other_pages_ms': other_ms,
+        'steady_ms': steady_ms,
+    }
+
+
+def main():
+    args = parse_args()
+    if args.child:
+        serve(args.child, args.db)
+        return
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'cold.sqlite3')
+    prepare_database(args, path)
+    paths = sample_paths()
+    runs = {variant: [] for variant in args.variants}
+    # Варианты чередуются, чтобы дрейф машины не достался одному из них.
+    for _ in range(args.runs):
+        for variant in args.variants:
+            runs[variant].append(cold_run(variant, path, paths))
+    result = {
+        variant: {
+            metric: round(statistics.median(
+                run[metric] for run in results), 1)
+            for metric in METRICS
+        }
+        for variant, results in runs.items()
+    }
+    print(f'Медианы по {args.runs} запускам, мс; страницы: {", ".join(paths)}')
+    print(f'  {"":8}' + ''.join(f'{metric:>16}' for metric in METRICS))
+    for variant, metrics in result.items():
+        print(f'  {variant:8}' + ''.join(
+            f'{metrics[metric]:16.1f}' for metric in METRICS))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump(result, output, ensure_ascii=False, indent=2)
+    if args.db is None:
+        shutil.rmtree(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
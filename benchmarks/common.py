@@ -0,0 +1,38 @@
+"""Общая настройка Django для скриптов из benchmarks/."""
+import os
+import statistics
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT_DIR, 'yatube')
+
+
+def setup_django(database=None, **overrides):
+    """
+    Настраивает Django из yatube.settings. database подменяет файл
+    SQLite, остальные аргументы - значения настроек.
+    """
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+    from django.conf import settings
+
+    if database is not None:
+        settings.DATABASES['default']['NAME'] = database
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+
+    import django
+    django.setup()
+
+
+def timed(func, repeat):
+    """Медиана времени выполнения func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
@@ -0,0 +1,204 @@
+"""
+Планы (EXPLAIN QUERY PLAN) и время запросов трех лент
+до и после составных индексов Post на сгенерированных данных.
+
+    python benchmarks/feed_indexes.py --posts 1000000
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from common import setup_django, timed
+
+OLD_INDEXES = {
+    'posts_post_author_id_idx': 'author_id',
+    'posts_post_group_id_idx': 'group_id',
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', help='файл SQLite (по умолчанию временный)')
+    parser.add_argument('--json', help='куда сохранить результаты')
+    return parser.parse_args()
+
+
+def sqlite_datetime(value):
+    """Дата в формате, в котором Django хранит ее в SQLite."""
+    return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def fill_database(path, args):
+    """Быстрая вставка данных в обход ORM, с перекосом по авторам."""
+    rnd = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    db = sqlite3.connect(path)
+    db.execute('PRAGMA journal_mode = OFF')
+    db.execute('PRAGMA synchronous = OFF')
+    db.executemany(
+        'INSERT INTO auth_user (id, password, is_superuser, username, '
+        'first_name, last_name, email, is_staff, is_active, date_joined) '
+        "VALUES (?, '!', 0, ?, '', '', '', 0, 1, ?)",
+        (
+            (n, f'user{n}', sqlite_datetime(now))
+            for n in range(1, args.users + 1)
+        )
+    )
+    db.executemany(
+        'INSERT INTO posts_group '
+        '(id, title, slug, description, posts_count) '
+        "VALUES (?, ?, ?, '', 0)",
+        (
+            (n, f'Группа {n}', f'group-{n}')
+            for n in range(1, args.groups + 1)
+        )
+    )
+    author_weights = [rnd.paretovariate(1.2) for _ in range(args.users)]
+    group_weights = [rnd.paretovariate(1.5) for _ in range(args.groups)]
+    authors = list(range(1, args.users + 1))
+    groups = list(range(1, args.groups + 1))
+    span = timedelta(days=3 * 365).total_seconds()
+    batch = 50_000
+    for start in range(0, args.posts, batch):
+        size = min(batch, args.posts - start)
+        author_ids = rnd.choices(authors, author_weights, k=size)
+        group_ids = rnd.choices(groups, group_weights, k=size)
+        rows = []
+        for author_id, group_id in zip(author_ids, group_ids):
+            pub_date = sqlite_datetime(
+                now - timedelta(seconds=rnd.random() * span))
+            rows.append((
+                f'Пост номер {start + len(rows)}', pub_date, pub_date,
+                author_id, group_id if rnd.random() < 0.7 else None
+            ))
+        db.executemany(
+            'INSERT INTO posts_post (text, pub_date, edited, author_id, '
+            "group_id, image) VALUES (?, ?, ?, ?, ?, '')",
+            rows
+        )
+    db.commit()
+    db.close()
+
+
+def feed_queries():
+    """Выборки лент и номера страниц: {название: (queryset, страница)}."""
+    from django.db.models import Count
+
+    from posts.models import Post
+
+    top_author = (
+        Post.objects.order_by().values('author')
+        .annotate(total=Count('pk')).order_by('-total')[0]['author'])
+    hot_group = (
+        Post.objects.order_by().filter(group__isnull=False).values('group')
+        .annotate(total=Count('pk')).order_by('-total')[0]['group'])
+    feed = Post.objects.for_feed()
+    return {
+        'index, стр. 1': (feed, 1),
+        'index, стр. 1000': (feed, 1000),
+        'group, стр. 1': (feed.filter(group_id=hot_group), 1),
+        'group, стр. 100': (feed.filter(group_id=hot_group), 100),
+        'profile, стр. 1': (feed.filter(author_id=top_author), 1),
+        'profile, стр. 10': (feed.filter(author_id=top_author), 10),
+    }
+
+
+def switch_indexes(composite):
+    """Оставляет либо старые индексы по FK, либо составные индексы."""
+    from django.db import connection
+
+    from posts.models import Post
+
+    table = Post._meta.db_table
+    with connection.schema_editor() as editor:
+        for index in Post._meta.indexes:
+            editor.execute(f'DROP INDEX IF EXISTS "{index.name}"')
+        for name in OLD_INDEXES:
+            editor.execute(f'DROP INDEX IF EXISTS "{name}"')
+        if composite:
+            for index in Post._meta.indexes:
+                editor.add_index(Post, index)
+        else:
+            for name, column in OLD_INDEXES.items():
+                editor.execute(
+                    f'CREATE INDEX "{name}" ON "{table}" ("{column}")')
+        editor.execute('ANALYZE')
+
+
+def measure(queries, repeat):
+    """
+    Время получения страницы так, как ее берет лента
+    (FeedPaginator.page), и планы всех ее запросов кроме COUNT(*).
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    from posts.utils import FeedPaginator
+
+    results = {}
+    for name, (queryset, number) in queries.items():
+        count = queryset.count()
+
+        def run():
+            paginator = FeedPaginator(queryset, 10)
+            paginator.count = count
+            list(paginator.page(number))
+
+        with CaptureQueriesContext(connection) as captured:
+            run()
+        plan = []
+        with connection.cursor() as cursor:
+            for query in captured.captured_queries:
+                cursor.execute(f'EXPLAIN QUERY PLAN {query["sql"]}')
+                plan.extend(row[-1] for row in cursor.fetchall())
+        results[name] = {'plan': plan, 'ms': timed(run, repeat)}
+    return results
+
+
+def main():
+    args = parse_args()
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+    fresh = not os.path.exists(path)
+    setup_django(path)
+
+    from django.core.management import call_command
+
+    if fresh:
+        call_command('migrate', verbosity=0)
+        print(f'Генерируем {args.posts} постов в {path}...')
+        fill_database(path, args)
+        call_command('recount_posts', verbosity=0)
+
+    queries = feed_queries()
+    report = {}
+    for state, composite in (('до', False), ('после', True)):
+        switch_indexes(composite)
+        report[state] = measure(queries, args.repeat)
+
+    for name in queries:
+        print(f'\n== {name}')
+        for state, results in report.items():
+            result = results[name]
+            print(f'  {state}: {result["ms"]:.2f} мс')
+            for line in result['plan']:
+                print(f'    {line}')
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+    if args.db is None:
+        shutil.rmtree(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,462 @@
+"""
+Нагрузочный тест: поднимает yatube.wsgi в нескольких процессах
+на локальном порту и гоняет по нему смесь запросов из файла
+(или повторяет записанный access-лог). Печатает пропускную
+способность, гистограмму задержек и долю ошибок.
+
+    python benchmarks/loadtest.py --db /tmp/load.sqlite3 --duration 30
+    python benchmarks/loadtest.py --db ... --replay access.log
+
+Смесь - JSON-список {"name", "weight", "path"} или
+{"name", "weight", "action": "login" | "create"}. В path можно
+подставлять {deep_page}, {hot_group}, {author} и {post_id}.
+"""
+import argparse
+import bisect
+import http.client
+import json
+import os
+import random
+import re
+import shutil
+import signal
+import statistics
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from common import ROOT_DIR, setup_django
+
+DEFAULT_MIX = os.path.join(ROOT_DIR, 'benchmarks', 'mixes', 'default.json')
+UNTIL = '2024-01-01'
+PASSWORD = 'loadtest-password'
+# Границы корзин гистограммы, мс.
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+LOG_REQUEST = re.compile(r'"(?P<method>[A-Z]+) (?P<path>\S+) HTTP/[\d.]+"')
+CSRF_INPUT = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--db', help='файл SQLite; нет файла - сгенерировать')
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument(
+        '--server-workers', type=int, default=2 * (os.cpu_count() or 1),
+        help='процессы WSGI-сервера')
+    parser.add_argument(
+        '--concurrency', type=int, default=8,
+        help='одновременные клиенты')
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument(
+        '--warmup', type=float, default=3,
+        help='секунды в начале, которые не попадают в отчет '
+             '(при --replay эти строки лога тоже не учитываются)')
+    parser.add_argument('--mix', default=DEFAULT_MIX)
+    parser.add_argument(
+        '--replay', help='access-лог (common/combined) для повтора')
+    parser.add_argument('--json', help='куда сохранить результаты')
+    return parser.parse_args()
+
+
+def shared_cache(location):
+    """
+    Файловый кеш, общий для процессов сервера, как в production:
+    со своим LocMemCache у каждого процесса сброс кеша по правке
+    не доходит до остальных. Размер - как в yatube.settings.
+    """
+    return {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+            'OPTIONS': {'MAX_ENTRIES': 20000, 'CULL_FREQUENCY': 4},
+        }
+    }
+
+
+def prepare_database(args, path, cache_dir):
+    from django.core.management import call_command
+
+    fresh = not os.path.exists(path)
+    setup_django(path, DEBUG=False, CACHES=shared_cache(cache_dir))
+    if fresh:
+        call_command('migrate', verbosity=0)
+        print(f'Генерируем {args.posts} постов...')
+        call_command(
+            'seed', f'--until={UNTIL}', posts=args.posts,
+            users=max(10, args.posts // 50),
+            groups=max(5, args.posts // 2000), seed=args.seed, verbosity=0
+        )
+
+
+def login_users(count):
+    """Пользователи с известным паролем для входа и новых постов."""
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    usernames = [f'loadtest-{number}' for number in range(count)]
+    existing = set(
+        User.objects.filter(username__in=usernames)
+        .values_list('username', flat=True))
+    for username in usernames:
+        if username not in existing:
+            User.objects.create_user(username, password=PASSWORD)
+    return usernames
+
+
+class Samples:
+    """Значения для подстановки в адреса смеси, выбранные из базы."""
+
+    def __init__(self, rnd):
+        from django.conf import settings
+        from django.db.models import Max, Min
+
+        from posts.models import AuthorStats, Group, Post
+
+        self.rnd = rnd
+        groups = Group.objects.order_by('-posts_count')[:20]
+        self.groups = [group.slug for group in groups]
+        self.group_weights = [group.posts_count + 1 for group in groups]
+        stats = (
+            AuthorStats.objects.select_related('author')
+            .order_by('-posts_count')[:200])
+        self.authors = [row.author.username for row in stats]
+        self.author_weights = [row.posts_count + 1 for row in stats]
+        bounds = Post.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        candidates = {
+            rnd.randint(bounds['low'], bounds['high']) for _ in range(5000)
+        }
+        self.post_ids = sorted(
+            Post.objects.filter(pk__in=candidates)
+            .values_list('pk', flat=True))
+        self.pages = max(2, Post.objects.count() // settings.POSTS_PER_PAGE)
+        self.group_id = groups[0].pk
+
+    def values(self):
+        rnd = self.rnd
+        return {
+            'deep_page': rnd.randint(2, self.pages),
+            'hot_group': rnd.choices(self.groups, self.group_weights)[0],
+            'author': rnd.choices(self.authors, self.author_weights)[0],
+            'post_id': rnd.choice(self.post_ids),
+        }
+
+
+def start_server(workers):
+    """
+    Prefork-сервер на wsgiref: родитель открывает сокет, дочерние
+    процессы принимают соединения с него. Возвращает (порт, pid'ы).
+    """
+    from wsgiref.simple_server import (WSGIRequestHandler, WSGIServer,
+                                       make_server)
+
+    from django.db import connections
+
+    from yatube.wsgi import application
+
+    class Handler(WSGIRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    class Server(WSGIServer):
+        request_queue_size = 256
+
+    server = make_server(
+        '127.0.0.1', 0, application, server_class=Server,
+        handler_class=Handler)
+    connections.close_all()
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+            try:
+                server.serve_forever()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    port = server.server_address[1]
+    server.socket.close()
+    return port, pids
+
+
+def stop_server(pids):
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+
+class Session:
+    """Клиент с cookie, как у браузера; редиректы не выполняются."""
+
+    def __init__(self, port):
+        self.port = port
+        self.cookies = {}
+
+    def request(self, method, path, form=None):
+        from django.utils.encoding import iri_to_uri
+
+        path = iri_to_uri(path)
+        connection = http.client.HTTPConnection('127.0.0.1', self.port)
+        headers = {}
+        body = None
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items())
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        try:
+            connection.request(method, path, body, headers)
+            response = connection.getresponse()
+            content = response.read()
+        finally:
+            connection.close()
+        for header in response.headers.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        return response.status, content
+
+    def form_token(self, path):
+        status, content = self.request('GET', path)
+        match = CSRF_INPUT.search(content.decode())
+        if status != 200 or match is None:
+            raise RuntimeError(f'{path}: нет формы ({status})')
+        return match.group(1)
+
+    def post_form(self, path, form):
+        form = {'csrfmiddlewaretoken': self.form_token(path), **form}
+        status, content = self.request('POST', path, form)
+        if status != 302:
+            raise RuntimeError(f'{path}: форма не принята ({status})')
+        return status, content
+
+
+class LoadTest:
+
+    def __init__(self, port, args, rnd):
+        from django.urls import reverse
+
+        self.port = port
+        self.args = args
+        self.login_url = reverse('users:login')
+        self.create_url = reverse('posts:post_create')
+        self.usernames = login_users(args.concurrency)
+        self.samples = Samples(rnd)
+        self.lock = threading.Lock()
+        self.timings = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.error_examples = {}
+        self.recording = False
+
+    def record(self, name, started, error=None):
+        elapsed = (time.perf_counter() - started) * 1000
+        if not self.recording:
+            return
+        with self.lock:
+            self.timings[name].append(elapsed)
+            if error is not None:
+                self.errors[name] += 1
+                self.error_examples.setdefault(name, error)
+
+    def timed(self, name, action):
+        started = time.perf_counter()
+        try:
+            status, _ = action()
+        except (OSError, RuntimeError, http.client.HTTPException) as error:
+            self.record(name, started, str(error))
+            return
+        error = f'HTTP {status}' if status >= 400 else None
+        self.record(name, started, error)
+
+    def login(self, session, username):
+        session.cookies.clear()
+        return session.post_form(
+            self.login_url, {'username': username, 'password': PASSWORD})
+
+    def run_mix(self, mix, number, deadline):
+        rnd = random.Random(f'{self.args.seed}:{number}')
+        session = Session(self.port)
+        username = self.usernames[number]
+        logged_in = False
+        weights = [scenario['weight'] for scenario in mix]
+        while time.monotonic() < deadline:
+            scenario = rnd.choices(mix, weights)[0]
+            action = scenario.get('action')
+            if action == 'create' and not logged_in:
+                self.timed('вход', lambda: self.login(session, username))
+                logged_in = True
+            if action == 'login':
+                self.timed(
+                    scenario['name'], lambda: self.login(session, username))
+                logged_in = True
+            elif action == 'create':
+                text = f'Пост из нагрузочного теста {rnd.random()}'
+                form = {'text': text, 'group': self.samples.group_id}
+                self.timed(
+                    scenario['name'],
+                    lambda: session.post_form(self.create_url, form))
+            else:
+                with self.lock:
+                    path = scenario['path'].format(**self.samples.values())
+                self.timed(
+                    scenario['name'], lambda: session.request('GET', path))
+
+    def run_replay(self, requests, deadline):
+        session = Session(self.port)
+        while time.monotonic() < deadline:
+            with self.lock:
+                item = next(requests, None)
+            if item is None:
+                return
+            name, path = item
+            self.timed(name, lambda: session.request('GET', path))
+
+    def run(self, worker, arguments):
+        """
+        Прогрев, затем замер до окончания --duration. Клиент number
+        вызывает worker(*arguments(number), deadline).
+        """
+        started = time.monotonic()
+        deadline = started + self.args.warmup + self.args.duration
+        threads = [
+            threading.Thread(
+                target=worker, args=(*arguments(number), deadline))
+            for number in range(self.args.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(self.args.warmup)
+        self.recording = True
+        measured = time.monotonic()
+        for thread in threads:
+            thread.join()
+        return time.monotonic() - measured
+
+
+def load_mix(path):
+    with open(path, encoding='utf-8') as source:
+        mix = json.load(source)
+    for scenario in mix:
+        if scenario.get('action') not in (None, 'login', 'create'):
+            raise SystemExit(f'Неизвестное действие: {scenario}')
+        if scenario.get('action') is None and 'path' not in scenario:
+            raise SystemExit(f'Нет path: {scenario}')
+    return mix
+
+
+def read_log(path):
+    """
+    GET-запросы из access-лога по порядку: (страница, адрес).
+    Остальные методы пропускаются - тел запросов в логе нет.
+    """
+    from django.urls import Resolver404, resolve
+
+    with open(path, encoding='utf-8', errors='replace') as log:
+        for line in log:
+            match = LOG_REQUEST.search(line)
+            if match is None or match['method'] != 'GET':
+                continue
+            address = match['path']
+            try:
+                match = resolve(urlsplit(address).path)
+                name = match.view_name
+            except Resolver404:
+                name = 'не найдено'
+            yield name, address
+
+
+def percentile(values, share):
+    return statistics.quantiles(values, n=100)[int(share * 100) - 1]
+
+
+def histogram(values):
+    counts = [0] * (len(BUCKETS) + 1)
+    for value in values:
+        counts[bisect.bisect_left(BUCKETS, value)] += 1
+    return counts
+
+
+def report(test, elapsed):
+    total = sum(len(values) for values in test.timings.values())
+    errors = sum(test.errors.values())
+    everything = [
+        value for values in test.timings.values() for value in values]
+    result = {
+        'seconds': round(elapsed, 1),
+        'requests': total,
+        'rps': round(total / elapsed, 1),
+        'error_rate': round(errors / total, 4) if total else 0,
+        'histogram_ms': dict(zip(
+            [f'<={bucket}' for bucket in BUCKETS] + [f'>{BUCKETS[-1]}'],
+            histogram(everything))),
+        'pages': {},
+    }
+    for name, values in sorted(test.timings.items()):
+        result['pages'][name] = {
+            'requests': len(values),
+            'errors': test.errors[name],
+            'p50_ms': round(statistics.median(values), 1),
+            'p95_ms': round(percentile(values, 0.95), 1)
+            if len(values) > 1 else None,
+            'p99_ms': round(percentile(values, 0.99), 1)
+            if len(values) > 1 else None,
+        }
+    return result
+
+
+def print_report(result, test):
+    print(
+        f'\n{result["requests"]} запросов за {result["seconds"]} с: '
+        f'{result["rps"]} запр/с, ошибок {result["error_rate"]:.2%}'
+    )
+    print(f'\n  {"":28} {"запр.":>6} {"ошиб.":>6} '
+          f'{"p50":>7} {"p95":>7} {"p99":>7}')
+    for name, page in result['pages'].items():
+        tail = ' '.join(
+            f'{page[key]:7.1f}' if page[key] is not None else f'{"-":>7}'
+            for key in ('p50_ms', 'p95_ms', 'p99_ms'))
+        print(f'  {name[:28]:28} {page["requests"]:6} '
+              f'{page["errors"]:6} {tail}')
+    print('\nГистограмма задержек, мс:')
+    widest = max(result['histogram_ms'].values()) or 1
+    for bucket, count in result['histogram_ms'].items():
+        bar = '#' * round(40 * count / widest)
+        print(f'  {bucket:>7} {count:7} {bar}')
+    for name, example in test.error_examples.items():
+        print(f'Ошибка в «{name}»: {example}')
+
+
+def main():
+    args = parse_args()
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'load.sqlite3')
+    cache_dir = tempfile.mkdtemp()
+    prepare_database(args, path, cache_dir)
+    rnd = random.Random(args.seed)
+    port, pids = start_server(args.server_workers)
+    try:
+        test = LoadTest(port, args, rnd)
+        if args.replay:
+            requests = read_log(args.replay)
+            elapsed = test.run(test.run_replay, lambda number: (requests,))
+        else:
+            mix = load_mix(args.mix)
+            elapsed = test.run(test.run_mix, lambda number: (mix, number))
+    finally:
+        stop_server(pids)
+    result = report(test, elapsed)
+    print_report(result, test)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump(result, output, ensure_ascii=False, indent=2)
+    shutil.rmtree(cache_dir)
+    if args.db is None:
+        shutil.rmtree(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
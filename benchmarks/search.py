@@ -0,0 +1,103 @@
+"""
+Время страницы поиска (/search/?q=) на сгенерированных данных
+в сравнении с прежним поиском через LIKE '%...%'.
+
+    python benchmarks/search.py --posts 1000000
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+from common import setup_django, timed
+from feed_indexes import fill_database
+
+QUERIES = [
+    '123456',
+    'номер 123456',
+    'номер 12345',
+    'номер 1',
+    'пост',
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--db', help='файл SQLite (по умолчанию временный)')
+    parser.add_argument(
+        '--query', action='append', help='запрос (можно несколько раз)')
+    parser.add_argument(
+        '--like', action='store_true',
+        help='замерить и поиск через LIKE (на миллионах постов - секунды)')
+    parser.add_argument('--json', help='куда сохранить результаты')
+    return parser.parse_args()
+
+
+def measure(queries, repeat, like):
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    from posts.models import Post
+    from posts.utils import FeedPaginator
+    from posts.views import search
+
+    factory = RequestFactory()
+    results = {}
+    for query in queries:
+        request = factory.get('/search/', {'q': query})
+        request.user = AnonymousUser()
+        result = {
+            'fts_ms': timed(lambda: search(request), repeat),
+        }
+        if like:
+            posts = Post.objects.for_feed()
+            for term in query.split():
+                posts = posts.filter(text__icontains=term)
+
+            def run_like():
+                paginator = FeedPaginator(posts, 10)
+                list(paginator.page(1))
+
+            result['like_ms'] = timed(run_like, repeat)
+        results[query] = result
+    return results
+
+
+def main():
+    args = parse_args()
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench.sqlite3')
+    fresh = not os.path.exists(path)
+    setup_django(path)
+
+    from django.core.management import call_command
+
+    if fresh:
+        call_command('migrate', verbosity=0)
+        print(f'Генерируем {args.posts} постов в {path}...')
+        fill_database(path, args)
+        call_command('recount_posts', verbosity=0)
+    # Посты вставлены в обход триггеров - индекс строим заново.
+    call_command('rebuild_search_index', verbosity=0)
+
+    report = measure(args.query or QUERIES, args.repeat, args.like)
+    for query, result in report.items():
+        line = f'{query!r}: FTS5 {result["fts_ms"]:.2f} мс'
+        if 'like_ms' in result:
+            line += f', LIKE {result["like_ms"]:.2f} мс'
+        print(line)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+    if args.db is None:
+        shutil.rmtree(os.path.dirname(path))
+
+
+if __name__ == '__main__':
+    main()
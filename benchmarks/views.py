@@ -0,0 +1,306 @@
+"""
+Задержка (p50/p95), число SQL-запросов и размер ответа основных
+страниц на данных растущего размера, со сравнением с базовой линией.
+
+    python benchmarks/views.py                     # сравнить с базовой
+    python benchmarks/views.py --save-baseline     # записать базовую
+
+Выход с кодом 1, если p50 или размер ответа выросли больше чем
+на --threshold, p95 - больше чем на --p95-threshold, или страница
+стала делать больше запросов.
+Задержки в базовой линии имеют смысл только для той машины,
+на которой они записаны: на новой машине сначала --save-baseline.
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from common import ROOT_DIR, setup_django, timed
+
+BASELINE = os.path.join(ROOT_DIR, 'benchmarks', 'baselines', 'views.json')
+# Даты постов отсчитываются от этого дня, чтобы данные не зависели
+# от дня запуска.
+UNTIL = '2024-01-01'
+METRICS = ('p50_ms', 'p95_ms', 'queries', 'bytes')
+LATENCIES = ('p50_ms', 'p95_ms')
+WARMUP = 3
+
+
+def reference_ms():
+    """
+    Время эталонной работы на чистом Python. Скорость процессора
+    на общих машинах гуляет на десятки процентов, поэтому задержки
+    сравниваются с базовой линией в масштабе этого эталона.
+    """
+    def work():
+        total = 0
+        for number in range(100_000):
+            total += number * number
+        return total
+
+    return timed(work, 1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        '--sizes', default='1000,10000,100000',
+        help='размеры данных (число постов) через запятую')
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument(
+        '--data-dir', help='где хранить базы (по умолчанию временно)')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument(
+        '--threshold', type=float, default=0.25,
+        help='допустимый рост p50 и размера ответа (доля)')
+    parser.add_argument(
+        '--p95-threshold', type=float, default=1.0,
+        help='допустимый рост p95: хвост шумнее медианы')
+    parser.add_argument('--json', help='куда сохранить результаты')
+    return parser.parse_args()
+
+
+def use_database(path, args, size):
+    """Переключает Django на базу path, при отсутствии - создает ее."""
+    from django.core.cache import cache
+    from django.core.management import call_command
+    from django.db import connections
+
+    connection = connections['default']
+    connection.close()
+    connection.settings_dict['NAME'] = path
+    cache.clear()
+    if os.path.exists(path):
+        return
+    call_command('migrate', verbosity=0)
+    print(f'Генерируем {size} постов в {path}...')
+    call_command(
+        'seed', f'--until={UNTIL}',
+        users=max(10, size // 50), groups=max(5, size // 2000), posts=size,
+        seed=args.seed, workers=args.workers, verbosity=0
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def cases():
+    """
+    Страницы для замера: {название: (метод, адрес, данные, автор)}.
+    Автор - тот, от чьего имени идет запрос (None - аноним).
+    """
+    from django.db.models import Count
+    from django.urls import reverse
+
+    from posts.models import Group, Post
+
+    top_author = (
+        Post.objects.order_by().values('author')
+        .annotate(total=Count('pk')).order_by('-total')[0]['author'])
+    hot_group = (
+        Post.objects.order_by().filter(group__isnull=False).values('group')
+        .annotate(total=Count('pk')).order_by('-total')[0]['group'])
+    group = Group.objects.get(pk=hot_group)
+    post = (
+        Post.objects.filter(author_id=top_author).select_related('author')
+        .latest('pub_date', 'pk'))
+    author = post.author
+    edit_url = reverse('posts:post_edit', args=(post.pk,))
+    create_url = reverse('posts:post_create')
+    form = {'text': 'Пост из замера', 'group': hot_group}
+    return {
+        'index': ('get', reverse('posts:index'), None, None),
+        'group_posts': (
+            'get', reverse('posts:group_list', args=(group.slug,)),
+            None, None),
+        'profile': (
+            'get', reverse('posts:profile', args=(author.username,)),
+            None, None),
+        'post_detail': (
+            'get', reverse('posts:post_detail', args=(post.pk,)), None, None),
+        'post_create GET': ('get', create_url, None, author),
+        'post_create POST': ('post', create_url, form, author),
+        'post_edit GET': ('get', edit_url, None, author),
+        'post_edit POST': ('post', edit_url, form, author),
+    }
+
+
+def sender(method, url, data, author):
+    """Функция, выполняющая запрос к странице через тестовый клиент."""
+    from django.db import transaction
+    from django.test import Client
+
+    client = Client()
+    if author is not None:
+        client.force_login(author)
+    send = getattr(client, method)
+
+    def request():
+        # Записи откатываются, чтобы данные не менялись от замера к замеру.
+        with transaction.atomic():
+            response = send(url, data)
+            transaction.set_rollback(True)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url}: ответ {response.status_code}')
+        return response
+
+    return request
+
+
+def measure_phase(requests, repeat):
+    """
+    Замеры идут кругами: в каждом круге по одному запросу к каждой
+    странице и эталон, так что колебания скорости машины задевают
+    все страницы поровну.
+    """
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for request in requests.values():
+        for _ in range(WARMUP):
+            request()
+    timings = {name: [] for name in requests}
+    references = []
+    # Как timeit: сборка мусора посреди запроса дает выбросы в p95.
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            references.append(reference_ms())
+            for name, request in requests.items():
+                started = time.perf_counter()
+                request()
+                timings[name].append((time.perf_counter() - started) * 1000)
+    finally:
+        gc.enable()
+
+    results = {}
+    for name, request in requests.items():
+        with CaptureQueriesContext(connection) as captured:
+            response = request()
+        # Без SAVEPOINT/RELEASE/ROLLBACK от обертки замера.
+        queries = [
+            query for query in captured.captured_queries
+            if not query['sql'].startswith(
+                ('SAVEPOINT', 'RELEASE', 'ROLLBACK'))
+        ]
+        results[name] = {
+            'reference_ms': round(statistics.median(references), 3),
+            'p50_ms': round(statistics.median(timings[name]), 3),
+            'p95_ms': round(statistics.quantiles(timings[name], n=20)[-1], 3),
+            'queries': len(queries),
+            'bytes': len(response.content),
+        }
+    return results
+
+
+def measure(repeat):
+    """
+    Сначала чтение, потом запись: POST сбрасывает кеши лент,
+    и иначе каждое чтение шло бы после записи.
+    """
+    from django.core.cache import cache
+
+    cache.clear()
+    requests = {name: sender(*case) for name, case in cases().items()}
+    reads = {
+        name: request for name, request in requests.items()
+        if not name.endswith('POST')
+    }
+    writes = {
+        name: request for name, request in requests.items()
+        if name.endswith('POST')
+    }
+    results = {**measure_phase(reads, repeat), **measure_phase(writes, repeat)}
+    return {name: results[name] for name in requests}
+
+
+def regressions(report, baseline, threshold, p95_threshold):
+    """Строки с описанием ухудшений относительно baseline."""
+    found = []
+    for size, results in report.items():
+        for name, result in results.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            speed = result['reference_ms'] / base['reference_ms']
+            for metric in METRICS:
+                value, limit = result[metric], base[metric]
+                if metric in LATENCIES:
+                    limit *= speed
+                if metric == 'p95_ms':
+                    limit *= 1 + p95_threshold
+                elif metric != 'queries':
+                    limit *= 1 + threshold
+                if value > limit:
+                    found.append(
+                        f'{size} постов, {name}: {metric} {value} '
+                        f'(было {base[metric]})'
+                    )
+    return found
+
+
+def print_report(report):
+    for size, results in report.items():
+        print(f'\n== {size} постов')
+        print(f'  {"":18} {"p50, мс":>9} {"p95, мс":>9} '
+              f'{"запросы":>8} {"байты":>8}')
+        for name, result in results.items():
+            print(
+                f'  {name:18} {result["p50_ms"]:9.2f} {result["p95_ms"]:9.2f} '
+                f'{result["queries"]:8} {result["bytes"]:8}'
+            )
+
+
+def main():
+    args = parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    data_dir = args.data_dir or tempfile.mkdtemp()
+    os.makedirs(data_dir, exist_ok=True)
+    # Шаблоны - через кешированный загрузчик, как в бою.
+    setup_django(DEBUG=False)
+
+    report = {}
+    for size in sizes:
+        path = os.path.join(data_dir, f'views-{size}-{args.seed}.sqlite3')
+        use_database(path, args, size)
+        report[str(size)] = measure(args.repeat)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+    if args.data_dir is None:
+        shutil.rmtree(data_dir)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        print(f'\nБазовая линия записана в {args.baseline}')
+        return
+    if not os.path.exists(args.baseline):
+        print(f'\nНет базовой линии {args.baseline}: сравнивать не с чем.')
+        return
+    with open(args.baseline, encoding='utf-8') as source:
+        baseline = json.load(source)
+    found = regressions(
+        report, baseline, args.threshold, args.p95_threshold)
+    if found:
+        print('\nУхудшения:')
+        for line in found:
+            print(f'  {line}')
+        sys.exit(1)
+    print('\nУхудшений нет.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import json
+import logging
+
+import pytest
+
+from core.middleware import RequestStats
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestInstrumentationMiddleware:
+
+    def test_disabled_by_default(self, client, few_posts_with_group):
+        response = client.get('/')
+        assert 'Server-Timing' not in response, (
+            'Без INSTRUMENT_REQUESTS заголовок Server-Timing не нужен'
+        )
+
+    def test_server_timing_and_log(self, client, settings, caplog,
+                                   few_posts_with_group):
+        settings.INSTRUMENT_REQUESTS = True
+        settings.INTERNAL_IPS = ['127.0.0.1']
+        with caplog.at_level(logging.INFO, logger='core.instrumentation'):
+            response = client.get('/')
+        metrics = [
+            metric.split(';')[0]
+            for metric in response['Server-Timing'].split(', ')
+        ]
+        for metric in ('total', 'db', 'mw.SessionMiddleware', 'view',
+                       'template'):
+            assert metric in metrics
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['url_name'] == 'posts:index'
+        assert record['queries'] > 0
+        assert record['template_ms'] > 0
+        assert record['templates']['templates']['base.html']['calls'] == 1
+        assert 'hot-template' in metrics
+        assert 'group_by_slug' in record['lookup_caches']
+
+    def test_server_timing_only_for_staff(self, client, user, settings,
+                                          caplog, few_posts_with_group):
+        settings.INSTRUMENT_REQUESTS = True
+        with caplog.at_level(logging.INFO, logger='core.instrumentation'):
+            response = client.get('/')
+        assert 'Server-Timing' not in response, (
+            'Текст SQL и имена шаблонов не должны уходить всем клиентам'
+        )
+        assert json.loads(caplog.records[-1].getMessage())['queries'] > 0
+        user.is_staff = True
+        user.save()
+        client.force_login(user)
+        assert 'Server-Timing' in client.get('/')
+
+    def test_duplicate_queries(self):
+        stats = RequestStats()
+        for post_id in (1, 2, 2):
+            stats.record_query(
+                'SELECT * FROM posts_post WHERE id = %s', (post_id,), 1.0)
+        stats.record_query('SELECT 1', (), 1.0)
+        assert stats.queries == 4
+        assert stats.duplicates == 1
+        assert stats.similar == ('SELECT * FROM posts_post WHERE id = %s', 3)
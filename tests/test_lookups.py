@@ -0,0 +1,119 @@
+import pytest
+from django.db import connection, transaction
+from django.http import Http404
+from django.test.utils import CaptureQueriesContext
+
+from core import lookups
+from core.lookups import LookupCache, lookup_stats
+from posts.lookups import author_by_username, group_by_slug
+from posts.models import Group
+
+# Внутри транзакции тестов с django_db кеш ничего не запоминает.
+pytestmark = [pytest.mark.django_db(transaction=True)]
+
+
+@pytest.fixture
+def groups():
+    return [
+        Group.objects.create(
+            title=f'Группа {number}', slug=f'group-{number}',
+            description='Описание')
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def cache():
+    return LookupCache(
+        'test_groups', Group.objects.all(), 'slug',
+        ('slug', 'id', 'title'), maxsize=2, ttl=60)
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    yield
+    group_by_slug.clear()
+    author_by_username.clear()
+
+
+def lookup_queries(cache, *slugs):
+    with CaptureQueriesContext(connection) as queries:
+        found = [cache.get(slug) for slug in slugs]
+    return found, len(queries)
+
+
+class TestLookupCache:
+
+    def test_hits_and_fresh_instances(self, cache, groups):
+        (first, second), queries = lookup_queries(
+            cache, 'group-0', 'group-0')
+        assert queries == 1
+        assert first == second and first is not second
+        assert first.title == 'Группа 0'
+        assert first.get_deferred_fields() >= {'description', 'posts_count'}
+        first.title = 'Правка в одном запросе'
+        assert cache.get('group-0').title == 'Группа 0'
+        assert cache.stats['hits'] == 2
+        assert cache.stats['misses'] == 1
+        assert lookup_stats()['test_groups']['size'] == 1
+
+    def test_lru_eviction(self, cache, groups):
+        lookup_queries(cache, 'group-0', 'group-1', 'group-0', 'group-2')
+        _, queries = lookup_queries(cache, 'group-0', 'group-2')
+        assert queries == 0
+        _, queries = lookup_queries(cache, 'group-1')
+        assert queries == 1
+        assert cache.stats['evictions'] == 2
+
+    def test_ttl(self, cache, groups, monkeypatch):
+        now = lookups.time.monotonic()
+        cache.get('group-0')
+        monkeypatch.setattr(lookups.time, 'monotonic', lambda: now + 61)
+        _, queries = lookup_queries(cache, 'group-0')
+        assert queries == 1
+        assert cache.stats['expired'] == 1
+
+    def test_misses_and_transactions_not_cached(self, cache, groups):
+        with pytest.raises(Http404):
+            cache.get_or_404('missing')
+        with transaction.atomic():
+            cache.get('group-0')
+        assert cache.stats['size'] == 0
+
+
+class TestLookupInvalidation:
+
+    def test_group_rename(self, client, groups):
+        group = groups[0]
+        assert group_by_slug.get('group-0').title == 'Группа 0'
+        group.slug = 'renamed'
+        group.title = 'Новое название'
+        group.save()
+        assert group_by_slug.get('group-0') is None
+        assert group_by_slug.get('renamed').title == 'Новое название'
+        group.delete()
+        assert group_by_slug.get('renamed') is None
+
+    def test_invalidated_after_commit(self, groups):
+        group = groups[0]
+        with transaction.atomic():
+            group.title = 'Новое название'
+            group.save()
+            # Читатель вне транзакции еще видит старую строку.
+            group_by_slug._store('group-0', (group.pk, 'Группа 0', 'group-0',
+                                             'Описание'))
+        assert group_by_slug.get('group-0').title == 'Новое название'
+
+    def test_profile_uses_cache(self, client, user):
+        url = f'/profile/{user.username}/'
+        client.get(url)
+        with CaptureQueriesContext(connection) as cold:
+            client.get(url)
+        user.first_name = 'Имя'
+        user.save()
+        response = client.get(url)
+        assert 'Имя' in response.content.decode()
+        assert not any(
+            'auth_user' in query['sql'] and 'username' in query['sql']
+            for query in cold.captured_queries)
+        assert author_by_username.stats['hits'] >= 1
@@ -0,0 +1,107 @@
+import hashlib
+import io
+import os
+
+import pytest
+from django.core.files.base import ContentFile, File
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core.middleware import MediaFilesMiddleware
+from core.storage import ContentAddressedStorage, is_content_addressed
+from core.uploads import HashingFileUploadHandler
+
+CONTENT = b'GIF89a' + bytes(range(256)) * 64
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+NAME = f'posts/{DIGEST[:2]}/{DIGEST}.gif'
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.MEDIA_SERVE = True
+    return tmp_path
+
+
+@pytest.fixture
+def storage(media):
+    return ContentAddressedStorage()
+
+
+@pytest.fixture
+def middleware(media):
+    return MediaFilesMiddleware(lambda request: HttpResponse('view'))
+
+
+def upload(settings, media, content):
+    settings.FILE_UPLOAD_TEMP_DIR = str(media / '.uploads')
+    handler = HashingFileUploadHandler()
+    handler.new_file('image', 'picture.GIF', 'image/gif', len(content))
+    for start in range(0, len(content), 1000):
+        handler.receive_data_chunk(content[start:start + 1000], start)
+    return handler.file_complete(len(content))
+
+
+class TestContentAddressedStorage:
+
+    def test_in_memory_names_by_hash(self, storage, media):
+        assert storage.save('posts/picture.gif', ContentFile(CONTENT)) == NAME
+        assert (media / NAME).read_bytes() == CONTENT
+        assert is_content_addressed(NAME)
+        assert not is_content_addressed('posts/picture.gif')
+
+    def test_duplicate_is_not_written(self, storage, media, monkeypatch):
+        storage.save('posts/first.gif', ContentFile(CONTENT))
+        monkeypatch.setattr(storage, '_spool', None)
+        assert storage.save('posts/second.GIF', ContentFile(CONTENT)) == NAME
+        assert os.listdir(media / 'posts' / DIGEST[:2]) == [f'{DIGEST}.gif']
+
+    def test_streams_large_file(self, storage, media):
+        content = File(io.BytesIO(CONTENT), name='picture.gif')
+        content.DEFAULT_CHUNK_SIZE = 1000
+        assert content.multiple_chunks()
+        assert storage.save('posts/picture.gif', content) == NAME
+        assert storage.save('posts/again.gif', content) == NAME
+        assert sorted(os.listdir(media)) == ['posts']
+
+    def test_temporary_upload_is_moved(self, settings, storage, media):
+        uploaded = upload(settings, media, CONTENT)
+        assert uploaded.content_hash == DIGEST
+        path = uploaded.temporary_file_path()
+        assert storage.save('posts/picture.GIF', uploaded) == NAME
+        assert not os.path.exists(path)
+        assert (media / NAME).read_bytes() == CONTENT
+        uploaded.close()
+
+        duplicate = upload(settings, media, CONTENT)
+        assert storage.save('posts/picture.gif', duplicate) == NAME
+        duplicate.close()
+        assert os.listdir(media / '.uploads') == []
+
+
+class TestMediaFiles:
+
+    def test_content_addressed_is_immutable(self, storage, middleware):
+        storage.save('posts/picture.gif', ContentFile(CONTENT))
+        factory = RequestFactory()
+        response = middleware(factory.get(f'/media/{NAME}'))
+        assert response['Cache-Control'] == (
+            'max-age=31536000, public, immutable')
+        assert response['Content-Type'] == 'image/gif'
+        assert b''.join(response.streaming_content) == CONTENT
+        response.file_to_stream.close()
+        response = middleware(
+            factory.get(f'/media/{NAME}', HTTP_IF_NONE_MATCH=response['ETag']))
+        assert response.status_code == 304
+
+    def test_other_files_and_missing(self, media, middleware):
+        (media / 'cache').mkdir()
+        (media / 'cache' / 'thumb.jpg').write_bytes(b'jpeg')
+        (media / '.upload-partial').write_bytes(b'partial')
+        factory = RequestFactory()
+        response = middleware(factory.get('/media/cache/thumb.jpg'))
+        assert response['Cache-Control'] == 'max-age=60, public'
+        response.file_to_stream.close()
+        for path in ('/media/.upload-partial', '/media/missing.gif',
+                     '/media/../settings.py', '/static/cache/thumb.jpg'):
+            assert middleware(factory.get(path)).content == b'view'
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+from django.core.management import call_command
+
+from core.profiling import COLLAPSED_SUFFIX, PSTATS_SUFFIX, rotate
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def profiling(settings, tmp_path):
+    settings.PROFILE_REQUESTS = True
+    settings.PROFILE_SAMPLE_RATE = 0
+    settings.PROFILE_DIR = str(tmp_path)
+    settings.PROFILE_SAMPLER_INTERVAL = 0.0001
+    return tmp_path
+
+
+class TestProfilingMiddleware:
+
+    def test_disabled_by_default(self, admin_client, few_posts_with_group):
+        response = admin_client.get('/', HTTP_X_PROFILE='1')
+        assert 'X-Profile-Id' not in response
+
+    def test_header_only_for_staff(self, client, profiling,
+                                   few_posts_with_group):
+        response = client.get('/', HTTP_X_PROFILE='1')
+        assert 'X-Profile-Id' not in response
+        assert not os.listdir(profiling)
+
+    def test_staff_header_dumps_per_view(self, admin_client, profiling,
+                                         few_posts_with_group):
+        response = admin_client.get('/', HTTP_X_PROFILE='1')
+        directory = profiling / 'posts.views.index'
+        name = response['X-Profile-Id']
+        assert (directory / (name + PSTATS_SUFFIX)).exists()
+        collapsed = (directory / (name + COLLAPSED_SUFFIX)).read_text()
+        assert 'index (posts/views.py' in collapsed
+
+    def test_sample_rate(self, client, settings, profiling,
+                         few_posts_with_group):
+        settings.PROFILE_SAMPLE_RATE = 1
+        client.get('/')
+        assert os.listdir(profiling / 'posts.views.index')
+
+    def test_rotation(self, tmp_path):
+        for index in range(5):
+            for suffix in (PSTATS_SUFFIX, COLLAPSED_SUFFIX):
+                (tmp_path / f'{index}.0-1-x{suffix}').write_text('')
+        rotate(str(tmp_path), 2)
+        assert sorted(os.listdir(tmp_path)) == [
+            '3.0-1-x.collapsed', '3.0-1-x.prof',
+            '4.0-1-x.collapsed', '4.0-1-x.prof',
+        ]
+
+    def test_report(self, admin_client, profiling, tmp_path_factory,
+                    capsys, few_posts_with_group):
+        for _ in range(2):
+            admin_client.get('/', HTTP_X_PROFILE='1')
+        output = tmp_path_factory.mktemp('merged')
+        call_command('profile_report', dir=str(profiling),
+                     output=str(output), limit=5)
+        report = capsys.readouterr().out
+        assert 'posts.views.index: профилей 2' in report
+        assert (output / 'posts.views.index.prof').exists()
+        assert (output / 'posts.views.index.collapsed').exists()
@@ -0,0 +1,17 @@
+import pytest
+
+from core.query_budget import get_within_budget
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestFeedQueryBudget:
+
+    def test_index_query_budget(self, client, few_posts_with_group):
+        get_within_budget(client, '/', 5)
+
+    def test_group_query_budget(self, client, few_posts_with_group):
+        get_within_budget(client, f'/group/{few_posts_with_group.group.slug}/', 5)
+
+    def test_profile_query_budget(self, client, few_posts_with_group):
+        get_within_budget(client, f'/profile/{few_posts_with_group.author.username}/', 5)
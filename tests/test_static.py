@@ -0,0 +1,72 @@
+import gzip
+import os
+
+import pytest
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core.middleware import StaticFilesMiddleware
+
+STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+
+
+@pytest.fixture
+def collected(settings, tmp_path):
+    settings.STATIC_ROOT = str(tmp_path)
+    settings.STATICFILES_STORAGE = STORAGE
+    settings.STATICFILES_SERVE = True
+    call_command('collectstatic', interactive=False, verbosity=0)
+    return tmp_path
+
+
+@pytest.fixture
+def middleware(collected):
+    return StaticFilesMiddleware(lambda request: HttpResponse('view'))
+
+
+def hashed_url(name):
+    from django.contrib.staticfiles.storage import staticfiles_storage
+
+    return staticfiles_storage.url(name)
+
+
+class TestStaticFiles:
+
+    def test_collectstatic_hashes_and_compresses(self, collected):
+        url = hashed_url('css/bootstrap.min.css')
+        assert url != '/static/css/bootstrap.min.css'
+        path = collected / url[len('/static/'):]
+        with gzip.open(f'{path}.gz') as compressed:
+            assert compressed.read() == path.read_bytes()
+        assert not os.path.exists(collected / 'img' / 'logo.png.gz')
+
+    def test_serves_precompressed_immutable(self, middleware):
+        url = hashed_url('css/bootstrap.min.css')
+        request = RequestFactory().get(url, HTTP_ACCEPT_ENCODING='gzip, br')
+        response = middleware(request)
+        assert response['Content-Encoding'] in ('gzip', 'br')
+        assert response['Content-Type'] == 'text/css; charset=utf-8'
+        assert response['Vary'] == 'Accept-Encoding'
+        assert 'immutable' in response['Cache-Control']
+        assert response.file_to_stream is not None
+        response.file_to_stream.close()
+
+    def test_identity_and_not_modified(self, middleware):
+        url = hashed_url('css/bootstrap.min.css')
+        factory = RequestFactory()
+        response = middleware(factory.get(url, HTTP_ACCEPT_ENCODING='br;q=0'))
+        assert 'Content-Encoding' not in response
+        response.file_to_stream.close()
+        response = middleware(
+            factory.get(url, HTTP_IF_NONE_MATCH=response['ETag']))
+        assert response.status_code == 304
+
+    def test_unhashed_and_unknown(self, middleware):
+        factory = RequestFactory()
+        response = middleware(factory.get('/static/img/logo.png'))
+        assert response['Cache-Control'] == 'max-age=60, public'
+        assert 'Vary' not in response
+        response.file_to_stream.close()
+        assert middleware(factory.get('/static/missing.css')).content == (
+            b'view')
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from django.core.management import call_command
+from django.template import Context, Engine
+
+from core.template_profiler import profile_templates
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def engine():
+    return Engine(loaders=[('django.template.loaders.locmem.Loader', {
+        'page.html': '<main>{% include "part.html" %}'
+                     '{% include "part.html" %}</main>',
+        'part.html': '{% for i in items %}{{ i }}{% endfor %}',
+    })])
+
+
+class TestTemplateProfiler:
+
+    def test_templates_and_includes(self, engine):
+        with profile_templates() as profile:
+            engine.get_template('page.html').render(
+                Context({'items': range(3)}))
+        page = profile.templates['page.html']
+        part = profile.templates['part.html']
+        include = profile.tags['include part.html']
+        assert (page.calls, part.calls, include.calls) == (1, 2, 2)
+        assert page.own_ms == pytest.approx(page.total_ms - part.total_ms)
+        assert include.total_ms >= part.total_ms
+        assert include.own_ms == pytest.approx(
+            include.total_ms - part.total_ms)
+        assert profile.total_ms == page.total_ms
+
+    def test_nested_profiles(self, engine):
+        with profile_templates() as outer:
+            with profile_templates() as inner:
+                engine.get_template('part.html').render(Context())
+            engine.get_template('part.html').render(Context())
+        assert inner.templates['part.html'].calls == 1
+        assert outer.templates['part.html'].calls == 2
+
+    def test_inactive(self, engine):
+        with profile_templates() as profile:
+            pass
+        engine.get_template('page.html').render(Context())
+        assert not profile.templates
+
+    def test_command(self, capsys, few_posts_with_group):
+        call_command('profile_templates', '/', repeat=2, json=True)
+        report = json.loads(capsys.readouterr().out)
+        assert report['templates']['base.html']['calls'] == 2
+        assert report['tags']['include includes/paginator.html']['calls'] == 2
+        assert 'url posts:index' in report['tags']
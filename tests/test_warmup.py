@@ -0,0 +1,28 @@
+import pytest
+from django.core.management import call_command
+
+from core.warmup import compile_templates, reverse_urls, template_names
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestWarmup:
+
+    def test_compile_templates(self):
+        compiled, errors = compile_templates()
+        assert not errors
+        assert compiled >= 20
+
+    def test_template_names(self):
+        from django.template import engines
+
+        names = template_names(engines['django'].engine)
+        for name in ('base.html', 'posts/index.html', 'admin/base.html'):
+            assert name in names
+
+    def test_reverse_urls(self):
+        assert reverse_urls() >= 10
+
+    def test_command(self, capsys):
+        call_command('warmup')
+        assert 'Прогрев завершен' in capsys.readouterr().out
@@ -3,3 +3,8 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # До сборки цепочки middleware: ее слои оборачиваются при сборке.
+        from .middleware import install
+        install()
@@ -0,0 +1,141 @@
+"""
+Кеш объектов модели по уникальному полю в памяти процесса: slug
+группы, username автора. Ограничен по размеру (LRU) и по времени
+жизни записи (TTL); сбрасывается сигналами модели, а TTL ограничивает
+устаревание в остальных процессах, куда сигнал не доходит.
+"""
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.db import connections, router, transaction
+from django.http import Http404
+
+_caches = weakref.WeakValueDictionary()
+
+
+class LookupCache:
+    """
+    LRU-кеш объектов queryset по полю field. Хранятся только значения
+    полей fields, и каждый get собирает новый экземпляр, так что
+    правки объекта в одном запросе не видны другим. Строки, прочитанные
+    внутри транзакции, не кешируются: транзакция может откатиться.
+    Промахи (нет объекта) тоже не кешируются.
+    """
+
+    def __init__(self, name, queryset, field, fields, maxsize, ttl):
+        self.name = name
+        self.queryset = queryset
+        self.model = queryset.model
+        self.field = field
+        # from_db ждет значения в порядке полей модели.
+        self.fields = tuple(
+            field.attname for field in self.model._meta.concrete_fields
+            if field.attname in fields or field.name in fields)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+        _caches[name] = self
+
+    def get(self, value):
+        """Объект с field=value или None, если такого нет."""
+        row = self._cached(value)
+        if row is None:
+            row = (
+                self.queryset.filter(**{self.field: value})
+                .values_list(*self.fields).first()
+            )
+            if row is None:
+                return None
+            self._store(value, row)
+        return self.model.from_db(
+            router.db_for_read(self.model), self.fields, row)
+
+    def get_or_404(self, value):
+        instance = self.get(value)
+        if instance is None:
+            raise Http404(
+                f'No {self.model._meta.object_name} matches the given query.')
+        return instance
+
+    def _cached(self, value):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(value)
+            if entry is None:
+                self.misses += 1
+                return None
+            row, expires = entry
+            if expires <= now:
+                del self._entries[value]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(value)
+            self.hits += 1
+            return row
+
+    def _store(self, value, row):
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        alias = router.db_for_read(self.model)
+        if connections[alias].in_atomic_block:
+            return
+        with self._lock:
+            self._entries[value] = (row, time.monotonic() + self.ttl)
+            self._entries.move_to_end(value)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, pk):
+        """
+        Сбрасывает записи объекта pk - по pk, потому что старое
+        значение поля (slug до переименования) сигналу не известно.
+        Внутри транзакции сбрасывает еще раз после коммита: иначе
+        параллельный запрос успел бы закешировать старую строку.
+        """
+        self._discard(pk)
+        alias = router.db_for_write(self.model)
+        if connections[alias].in_atomic_block:
+            transaction.on_commit(lambda: self._discard(pk), using=alias)
+
+    def _discard(self, pk):
+        index = self.fields.index(self.model._meta.pk.attname)
+        with self._lock:
+            for value, (row, _) in list(self._entries.items()):
+                if row[index] == pk:
+                    del self._entries[value]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expired = 0
+
+    @property
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio':
+                    round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expired': self.expired,
+            }
+
+
+def lookup_stats():
+    """Статистика всех кешей процесса: {имя: stats}."""
+    return {name: cache.stats for name, cache in sorted(_caches.items())}
+
+
+def clear_lookups():
+    for cache in list(_caches.values()):
+        cache.clear()
@@ -0,0 +1,87 @@
+import io
+import os
+import pstats
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import (COLLAPSED_SUFFIX, PSTATS_SUFFIX, profile_names,
+                            read_collapsed, write_collapsed)
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводит дампы ProfilingMiddleware по каждому view: топ функций '
+        'из cProfile и самых частых кадров из сэмплера.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir', default=settings.PROFILE_DIR,
+            help='Каталог профилей, по умолчанию PROFILE_DIR.')
+        parser.add_argument(
+            '--view', action='append', default=[],
+            help='Только view, в имени которых есть эта строка.')
+        parser.add_argument('--sort', choices=SORT_KEYS, default='cumulative')
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--output',
+            help='Куда записать объединенные <view>.prof и <view>.collapsed.')
+
+    def handle(self, *args, **options):
+        root = options['dir']
+        if not os.path.isdir(root):
+            raise CommandError(f'Нет каталога профилей {root}.')
+        views = sorted(
+            view for view in os.listdir(root)
+            if os.path.isdir(os.path.join(root, view))
+            and all(part in view for part in options['view'])
+        )
+        if not views:
+            raise CommandError('Профилей не найдено.')
+        if options['output']:
+            os.makedirs(options['output'], exist_ok=True)
+        for view in views:
+            self.report(view, os.path.join(root, view), options)
+
+    def report(self, view, directory, options):
+        names = profile_names(directory)
+        paths = [os.path.join(directory, name) for name in names]
+        dumps = [
+            path + PSTATS_SUFFIX for path in paths
+            if os.path.exists(path + PSTATS_SUFFIX)]
+        stacks = Counter()
+        for path in paths:
+            if os.path.exists(path + COLLAPSED_SUFFIX):
+                read_collapsed(path + COLLAPSED_SUFFIX, stacks)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{view}: профилей {len(names)}, '
+            f'сэмплов {sum(stacks.values())}'))
+        if dumps:
+            buffer = io.StringIO()
+            stats = pstats.Stats(*dumps, stream=buffer)
+            stats.sort_stats(options['sort']).print_stats(options['limit'])
+            self.stdout.write(buffer.getvalue())
+        if stacks:
+            self.stdout.write('Самые частые кадры на вершине стека:')
+            for frame, count in self.leaves(stacks).most_common(
+                    options['limit']):
+                share = count / sum(stacks.values())
+                self.stdout.write(f'{share:7.1%} {count:7} {frame}')
+        if options['output']:
+            base = os.path.join(options['output'], view)
+            if dumps:
+                stats.dump_stats(base + PSTATS_SUFFIX)
+            if stacks:
+                write_collapsed(base + COLLAPSED_SUFFIX, stacks)
+
+    @staticmethod
+    def leaves(stacks):
+        """Сэмплы по функции, которая выполнялась в момент снимка."""
+        leaves = Counter()
+        for stack, count in stacks.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return leaves
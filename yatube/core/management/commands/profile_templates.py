@@ -0,0 +1,54 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from core.template_profiler import profile_templates
+
+
+class Command(BaseCommand):
+    help = (
+        'Запрашивает страницы тестовым клиентом и показывает, сколько '
+        'времени и вызовов приходится на каждый шаблон и тег.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=['/'])
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument(
+            '--user', help='Запрашивать страницы от имени пользователя.')
+        parser.add_argument(
+            '--json', action='store_true', help='Отчет одним JSON.')
+
+    def handle(self, *args, **options):
+        client = Client()
+        if options['user']:
+            try:
+                client.force_login(get_user_model().objects.get(
+                    username=options['user']))
+            except get_user_model().DoesNotExist:
+                raise CommandError(f'Нет пользователя {options["user"]}.')
+        with profile_templates() as profile:
+            for _ in range(options['repeat']):
+                for path in options['paths']:
+                    response = client.get(path)
+                    if response.status_code != 200:
+                        raise CommandError(
+                            f'{path}: ответ {response.status_code}')
+        report = profile.report(limit=options['limit'])
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False))
+            return
+        requests = options['repeat'] * len(options['paths'])
+        for title, rows in (('Шаблон', report['templates']),
+                            ('Тег', report['tags'])):
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{title:<44} {"вызовов":>9} {"всего, мс":>10} '
+                f'{"свое, мс":>10} {"на запрос":>10}'))
+            for name, timing in rows.items():
+                self.stdout.write(
+                    f'{name[:44]:<44} {timing["calls"]:>9} '
+                    f'{timing["total_ms"]:>10.1f} {timing["own_ms"]:>10.1f} '
+                    f'{timing["own_ms"] / requests:>10.2f}')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = (
+        'Компилирует все шаблоны, разбирает URLconf и подключается к БД, '
+        'как yatube.wsgi при WARMUP_ON_LOAD. Падает на ошибке в шаблоне, '
+        'так что годится и как проверка перед выкладкой.'
+    )
+
+    def handle(self, *args, **options):
+        steps = warmup()
+        (compiled, errors), templates_ms = steps['templates']
+        urls, urls_ms = steps['urls']
+        databases, databases_ms = steps['databases']
+        self.stdout.write(
+            f'Шаблонов: {compiled} за {templates_ms:.0f} мс\n'
+            f'Имен URL: {urls} за {urls_ms:.0f} мс\n'
+            f'Баз данных: {databases} за {databases_ms:.0f} мс'
+        )
+        if errors:
+            for name, error in errors.items():
+                self.stderr.write(f'{name}: {error}')
+            raise CommandError(f'Не компилируются шаблоны: {len(errors)}.')
+        self.stdout.write(self.style.SUCCESS('Прогрев завершен.'))
@@ -0,0 +1,451 @@
+import json
+import logging
+import mimetypes
+import os
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from functools import lru_cache, wraps
+from types import FunctionType, MethodType
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, SuspiciousFileOperation
+from django.core.handlers import base
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags
+
+from .lookups import lookup_stats
+from .profiling import RequestProfile, view_directory
+from .storage import is_content_addressed
+from .template_profiler import TemplateProfile, profile_templates
+
+logger = logging.getLogger('core.instrumentation')
+
+
+class RequestStats:
+    """Замеры одного запроса; время - в миллисекундах."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.statements = Counter()
+        # [имя, мс] слоев в порядке входа, сверху вниз.
+        self.layers = []
+        self.templates = TemplateProfile()
+
+    def record_query(self, sql, params, elapsed):
+        self.queries += 1
+        self.db_ms += elapsed
+        try:
+            self.statements[sql, repr(params)] += 1
+        except TypeError:
+            self.statements[sql, None] += 1
+
+    @property
+    def template_ms(self):
+        return self.templates.total_ms
+
+    @property
+    def duplicates(self):
+        """Повторы одного и того же запроса с теми же параметрами."""
+        return sum(count - 1 for count in self.statements.values())
+
+    @property
+    def similar(self):
+        """
+        Самый частый запрос без учета параметров и сколько раз
+        он выполнен: десятки одинаковых SELECT - признак N+1.
+        """
+        templates = Counter()
+        for (sql, _), count in self.statements.items():
+            templates[sql] += count
+        if not templates:
+            return None, 0
+        return templates.most_common(1)[0]
+
+
+def _elapsed_ms(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def _timed_layer(get_response, name):
+    """Время всего, что ниже слоя name, пишется в замеры запроса."""
+    @wraps(get_response)
+    def inner(request):
+        stats = getattr(request, 'instrumentation', None)
+        if stats is None:
+            return get_response(request)
+        layer = [name, 0.0]
+        stats.layers.append(layer)
+        started = time.perf_counter()
+        try:
+            return get_response(request)
+        finally:
+            layer[1] = _elapsed_ms(started)
+    return inner
+
+
+def _layer_name(handler):
+    # Метод - это BaseHandler._get_response: разбор URL и сам view.
+    if isinstance(handler, MethodType):
+        return 'view'
+    if isinstance(handler, FunctionType):
+        return handler.__qualname__
+    return type(handler).__name__
+
+
+def install():
+    """
+    Подменяет convert_exception_to_response, которым Django
+    оборачивает каждый слой при сборке цепочки middleware. Пока
+    INSTRUMENT_REQUESTS выключен, подмена возвращает обычную обертку,
+    так что в цепочке ничего не меняется. Вызывается из
+    CoreConfig.ready(), до сборки первой цепочки.
+    """
+    convert = base.convert_exception_to_response
+    if getattr(convert, 'instrumented', False):
+        return
+
+    @wraps(convert)
+    def instrumented(get_response):
+        if settings.INSTRUMENT_REQUESTS:
+            get_response = _timed_layer(
+                get_response, _layer_name(get_response))
+        return convert(get_response)
+    instrumented.instrumented = True
+    base.convert_exception_to_response = instrumented
+
+
+class InstrumentationMiddleware:
+    """
+    Считает запросы к БД, их время и повторы, время каждого
+    слоя middleware (через install()) и рендеринга шаблонов, в том
+    числе по каждому шаблону и тегу (через core.template_profiler).
+    Итог пишется строкой JSON в лог core.instrumentation вместе
+    со статистикой кешей core.lookups процесса. Заголовок
+    Server-Timing с текстом запросов и именами шаблонов получают
+    только сотрудники и адреса из INTERNAL_IPS.
+    Без INSTRUMENT_REQUESTS Django выкидывает middleware из цепочки
+    при загрузке, так что выключенное оно ничего не стоит.
+    Должно стоять первым в MIDDLEWARE.
+    """
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENT_REQUESTS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = request.instrumentation = RequestStats()
+
+        def record(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                stats.record_query(sql, params, _elapsed_ms(started))
+
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(record))
+            stats.templates = stack.enter_context(profile_templates())
+            response = self.get_response(request)
+        total_ms = _elapsed_ms(started)
+
+        if self.internal(request):
+            response['Server-Timing'] = ', '.join(
+                self.server_timing(name, duration, description)
+                for name, duration, description
+                in self.timings(stats, total_ms)
+            )
+        self.log(request, response, stats, total_ms)
+        return response
+
+    @staticmethod
+    def internal(request):
+        """Запрос сотрудника или с адреса из INTERNAL_IPS."""
+        if request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS:
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_staff
+
+    def timings(self, stats, total_ms):
+        """
+        (метрика, мс, описание) для Server-Timing. Время слоя -
+        без вложенных слоев; время view - без шаблонов.
+        """
+        sql, repeated = stats.similar
+        timings = [
+            ('total', total_ms, None),
+            ('db', stats.db_ms, f'{stats.queries} queries'),
+        ]
+        if stats.duplicates:
+            timings.append(
+                ('dup', None, f'{stats.duplicates} duplicate queries'))
+        if repeated > 1:
+            timings.append(('similar', None, f'{repeated}x {sql[:60]}'))
+        inclusive = [duration for _, duration in stats.layers] + [0.0]
+        for index, (name, duration) in enumerate(stats.layers):
+            own_ms = duration - inclusive[index + 1]
+            if name == 'view':
+                timings.append(('view', own_ms - stats.template_ms, None))
+            else:
+                timings.append((f'mw.{name}', own_ms, None))
+        timings.append(('template', stats.template_ms, None))
+        hottest = stats.templates.report(limit=1)['templates']
+        for name, timing in hottest.items():
+            timings.append(('hot-template', timing['own_ms'], name))
+        return timings
+
+    @staticmethod
+    def server_timing(name, duration, description):
+        metric = name
+        if duration is not None:
+            metric += f';dur={duration:.2f}'
+        if description is not None:
+            description = description.replace('\\', '\\\\')
+            description = description.replace('"', '\\"')
+            metric += f';desc="{description}"'
+        return metric
+
+    def log(self, request, response, stats, total_ms):
+        match = getattr(request, 'resolver_match', None)
+        sql, repeated = stats.similar
+        record = {
+            'url_name': match.view_name if match else None,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_ms': round(stats.db_ms, 2),
+            'queries': stats.queries,
+            'duplicates': stats.duplicates,
+            'most_repeated': {'sql': sql, 'count': repeated}
+            if repeated > 1 else None,
+            'template_ms': round(stats.template_ms, 2),
+            'templates': stats.templates.report(
+                limit=settings.INSTRUMENT_TEMPLATES_LIMIT),
+            'lookup_caches': lookup_stats(),
+            'layers_ms': {
+                name: round(duration, 2)
+                for name, duration, _ in self.timings(stats, total_ms)
+                if name.startswith('mw.') or name == 'view'
+            },
+        }
+        logger.info(json.dumps(record, ensure_ascii=False), extra={
+            'instrumentation': record,
+        })
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует выборку живых запросов: в среднем каждый
+    PROFILE_SAMPLE_RATE-й и каждый запрос сотрудника с заголовком
+    PROFILE_HEADER. Дампы пишутся в каталог view, который обработал
+    запрос; на запрос с заголовком имя профиля возвращается
+    в X-Profile-Id.
+    Стоит после AuthenticationMiddleware, чтобы видеть request.user.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILE_REQUESTS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILE_HEADER.upper().replace(
+            '-', '_')
+
+    def sampled(self, request):
+        if request.META.get(self.header):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_staff:
+                return True
+        rate = settings.PROFILE_SAMPLE_RATE
+        return rate > 0 and random.random() * rate < 1
+
+    def __call__(self, request):
+        if not self.sampled(request):
+            return self.get_response(request)
+        profile = RequestProfile(
+            settings.PROFILE_ENGINES, settings.PROFILE_SAMPLER_INTERVAL)
+        with profile:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        directory = view_directory(
+            settings.PROFILE_DIR, match._func_path if match else 'unresolved')
+        try:
+            name = profile.save(directory, settings.PROFILE_KEEP)
+        except OSError:
+            logger.exception('Не удалось сохранить профиль %s', request.path)
+            return response
+        if request.META.get(self.header):
+            response['X-Profile-Id'] = name
+        return response
+
+
+class StaticFile:
+    """Файл статики или загрузки с заголовками и сжатыми вариантами."""
+
+    __slots__ = ('path', 'headers', 'variants')
+
+    def __init__(self, path, immutable, max_age):
+        stat = os.stat(path)
+        content_type, _ = mimetypes.guess_type(path)
+        content_type = content_type or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in (
+                'application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        self.path = path
+        self.headers = {
+            'Content-Type': content_type,
+            'Cache-Control': (
+                'max-age=31536000, public, immutable' if immutable
+                else f'max-age={max_age}, public'),
+            'ETag': f'"{stat.st_size:x}-{int(stat.st_mtime):x}"',
+            'Last-Modified': http_date(stat.st_mtime),
+        }
+        self.variants = [
+            (encoding, path + extension)
+            for encoding, extension in StaticFilesMiddleware.ENCODINGS
+            if os.path.exists(path + extension)
+        ]
+        if self.variants:
+            self.headers['Vary'] = 'Accept-Encoding'
+
+
+def serve_file(request, static):
+    """Ответ с файлом StaticFile: 304 по ETag или сжатый вариант."""
+    if static.headers['ETag'] in parse_etags(
+            request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        for header in ('ETag', 'Cache-Control', 'Vary'):
+            if header in static.headers:
+                response[header] = static.headers[header]
+        return response
+    accepted = StaticFilesMiddleware.accepted_encodings(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    path, encoding = static.path, None
+    for variant_encoding, variant_path in static.variants:
+        if variant_encoding in accepted:
+            path, encoding = variant_path, variant_encoding
+            break
+    response = FileResponse(open(path, 'rb'))
+    for header, value in static.headers.items():
+        response[header] = value
+    if encoding is not None:
+        response['Content-Encoding'] = encoding
+    return response
+
+
+class StaticFilesMiddleware:
+    """
+    Отдает собранную collectstatic статику из STATIC_ROOT без похода
+    во view: заранее сжатый вариант по Accept-Encoding, файлы с хешем
+    в имени - с кешированием на год. Тело отдается через
+    wsgi.file_wrapper (sendfile), если сервер его поддерживает.
+    Список файлов читается при загрузке; выключено без STATICFILES_SERVE.
+    """
+
+    ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+    def __init__(self, get_response):
+        if not settings.STATICFILES_SERVE or not settings.STATIC_ROOT:
+            raise MiddlewareNotUsed
+        if not settings.STATIC_URL.startswith('/'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.files = self.index(
+            settings.STATIC_ROOT, settings.STATIC_URL,
+            settings.STATICFILES_MAX_AGE)
+
+    @staticmethod
+    def index(root, url, max_age):
+        """{адрес: StaticFile} для всех файлов, кроме сжатых вариантов."""
+        hashed = set()
+        manifest = os.path.join(root, 'staticfiles.json')
+        if os.path.exists(manifest):
+            with open(manifest, encoding='utf-8') as source:
+                hashed = set(json.load(source).get('paths', {}).values())
+        files = {}
+        compressed = tuple(
+            extension for _, extension in StaticFilesMiddleware.ENCODINGS)
+        for directory, _, names in os.walk(root):
+            for name in names:
+                path = os.path.join(directory, name)
+                relative = os.path.relpath(path, root).replace(os.sep, '/')
+                if name.endswith(compressed) or relative == 'staticfiles.json':
+                    continue
+                files[url + relative] = StaticFile(
+                    path, relative in hashed, max_age)
+        return files
+
+    def __call__(self, request):
+        static = self.files.get(request.path_info)
+        if static is None or request.method not in ('GET', 'HEAD'):
+            return self.get_response(request)
+        return serve_file(request, static)
+
+    @staticmethod
+    def accepted_encodings(header):
+        """Кодировки из Accept-Encoding, кроме запрещенных через q=0."""
+        accepted = set()
+        for item in header.split(','):
+            encoding, _, params = item.partition(';')
+            quality = params.strip().partition('q=')[2]
+            try:
+                if quality and float(quality) == 0:
+                    continue
+            except ValueError:
+                continue
+            accepted.add(encoding.strip().lower())
+        return accepted
+
+
+class MediaFilesMiddleware:
+    """
+    Отдает загрузки из MEDIA_ROOT так же, как статику. Файлы
+    ContentAddressedStorage (имя - хеш содержимого) кешируются
+    на год как immutable, остальные (миниатюры, старые загрузки) -
+    на MEDIA_MAX_AGE секунд. Загрузки меняются на ходу, поэтому
+    файл ищется на диске при каждом запросе; заголовки immutable
+    файлов запоминаются. Выключено без MEDIA_SERVE.
+    """
+
+    def __init__(self, get_response):
+        if not settings.MEDIA_SERVE or not settings.MEDIA_ROOT:
+            raise MiddlewareNotUsed
+        if not settings.MEDIA_URL.startswith('/'):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.root = settings.MEDIA_ROOT
+        self.url = settings.MEDIA_URL
+        self.max_age = settings.MEDIA_MAX_AGE
+        self.immutable_file = lru_cache(maxsize=settings.MEDIA_FILES_CACHED)(
+            lambda path: StaticFile(path, True, self.max_age))
+
+    def __call__(self, request):
+        path = request.path_info
+        if not path.startswith(self.url) or request.method not in (
+                'GET', 'HEAD'):
+            return self.get_response(request)
+        static = self.find(path[len(self.url):])
+        if static is None:
+            return self.get_response(request)
+        return serve_file(request, static)
+
+    def find(self, relative):
+        # Скрытые файлы - недописанные загрузки хранилища.
+        if any(part.startswith('.') for part in relative.split('/')):
+            return None
+        try:
+            path = safe_join(self.root, relative)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        if is_content_addressed(relative):
+            return self.immutable_file(path)
+        return StaticFile(path, False, self.max_age)
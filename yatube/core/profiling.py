@@ -0,0 +1,133 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+PSTATS_SUFFIX = '.prof'
+COLLAPSED_SUFFIX = '.collapsed'
+
+
+def frame_name(code):
+    """Кадр стека для флеймграфа: функция (каталог/файл:строка)."""
+    path = code.co_filename.replace(os.sep, '/').rsplit('/', 2)[-2:]
+    return f'{code.co_name} ({"/".join(path)}:{code.co_firstlineno})'
+
+
+def collapse(frame):
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    Раз в interval секунд снимает стек потока, в котором запущен,
+    из отдельного потока. Итог - счетчик свернутых стеков
+    (формат collapsed для flamegraph.pl и speedscope).
+    """
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        target = threading.get_ident()
+
+        def sample():
+            while not self._stopped.wait(self.interval):
+                frame = sys._current_frames().get(target)
+                if frame is not None:
+                    self.stacks[collapse(frame)] += 1
+
+        self._thread = threading.Thread(target=sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+
+class RequestProfile:
+    """cProfile и/или сэмплер стеков вокруг обработки запроса."""
+
+    def __init__(self, engines, interval):
+        self.profile = cProfile.Profile() if 'cprofile' in engines else None
+        self.sampler = (
+            StackSampler(interval) if 'sampler' in engines else None)
+
+    def __enter__(self):
+        if self.sampler is not None:
+            self.sampler.start()
+        if self.profile is not None:
+            self.profile.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profile is not None:
+            self.profile.disable()
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def save(self, directory, keep):
+        """
+        Пишет дампы в directory и оставляет там не больше keep
+        последних профилей. Возвращает имя профиля.
+        """
+        os.makedirs(directory, exist_ok=True)
+        name = f'{time.time():.6f}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        base = os.path.join(directory, name)
+        if self.profile is not None:
+            self.profile.dump_stats(base + PSTATS_SUFFIX)
+        if self.sampler is not None:
+            write_collapsed(base + COLLAPSED_SUFFIX, self.sampler.stacks)
+        rotate(directory, keep)
+        return name
+
+
+def write_collapsed(path, stacks):
+    with open(path, 'w', encoding='utf-8') as output:
+        for stack, count in stacks.most_common():
+            output.write(f'{stack} {count}\n')
+
+
+def read_collapsed(path, stacks=None):
+    stacks = Counter() if stacks is None else stacks
+    with open(path, encoding='utf-8') as source:
+        for line in source:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            if stack and count.isdigit():
+                stacks[stack] += int(count)
+    return stacks
+
+
+def profile_names(directory):
+    """Профили каталога от старых к новым (имя начинается со времени)."""
+    names = {
+        os.path.splitext(entry)[0] for entry in os.listdir(directory)
+        if entry.endswith((PSTATS_SUFFIX, COLLAPSED_SUFFIX))
+    }
+    return sorted(names, key=lambda name: float(name.split('-')[0]))
+
+
+def rotate(directory, keep):
+    for name in profile_names(directory)[:-keep or None]:
+        for suffix in (PSTATS_SUFFIX, COLLAPSED_SUFFIX):
+            try:
+                os.remove(os.path.join(directory, name + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def view_directory(root, view_name):
+    """Каталог профилей view: posts.views.index -> <root>/posts.views.index."""
+    safe = ''.join(
+        char if char.isalnum() or char in '._-' else '_'
+        for char in view_name)
+    return os.path.join(root, safe or 'unknown')
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def query_budget(budget, using=DEFAULT_DB_ALIAS):
+    """
+    Падает с AssertionError, если внутри блока выполнено
+    больше `budget` SQL-запросов. Подходит и для TestCase, и для pytest.
+    """
+    with CaptureQueriesContext(connections[using]) as context:
+        yield context
+    executed = len(context)
+    if executed > budget:
+        queries = '\n'.join(
+            f'{number}. {query["sql"]}'
+            for number, query in enumerate(context.captured_queries, start=1)
+        )
+        raise AssertionError(
+            f'Превышен бюджет запросов: {executed} > {budget}\n{queries}'
+        )
+
+
+def get_within_budget(client, url, budget, **extra):
+    """GET-запрос к странице с проверкой бюджета запросов."""
+    with query_budget(budget):
+        return client.get(url, **extra)
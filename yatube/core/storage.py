@@ -0,0 +1,165 @@
+import gzip
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Остальное (картинки, шрифты) уже сжато форматом.
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.xml',
+                '.map', '.ico')
+# Сжатый вариант, который не экономит хотя бы 5%, не сохраняется.
+MIN_RATIO = 0.95
+# Имя файла ContentAddressedStorage: <каталог>/ab/<sha256>.<расширение>.
+CONTENT_ADDRESSED = re.compile(
+    r'(?:^|/)(?P<prefix>[0-9a-f]{2})/(?P=prefix)[0-9a-f]{62}(?:\.\w+)?$')
+
+
+def gzip_compress(content):
+    # mtime=0: одинаковый файл дает одинаковый архив при каждой сборке.
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+def compressors():
+    """Расширение варианта и функция сжатия; brotli - если установлен."""
+    variants = [('.gz', gzip_compress)]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress))
+    return variants
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Файлы с хешем содержимого в имени (как ManifestStaticFilesStorage)
+    и рядом с каждым текстовым - заранее сжатые .gz и .br, которые
+    отдает core.middleware.StaticFilesMiddleware.
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name, hashed_name in self.hashed_files.items():
+            for path in {name, hashed_name}:
+                if path.endswith(COMPRESSIBLE) and self.exists(path):
+                    self.compress(path)
+
+    def compress(self, name):
+        path = self.path(name)
+        with open(path, 'rb') as source:
+            content = source.read()
+        for extension, compress in compressors():
+            compressed = compress(content)
+            if len(compressed) < len(content) * MIN_RATIO:
+                with open(path + extension, 'wb') as output:
+                    output.write(compressed)
+            elif os.path.exists(path + extension):
+                os.remove(path + extension)
+
+
+def is_content_addressed(name):
+    """Имя дала ContentAddressedStorage: содержимое по нему не меняется."""
+    return CONTENT_ADDRESSED.search(name) is not None
+
+
+def file_hash(path, chunk_size=64 * 1024):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранит загрузки под sha256 содержимого: posts/ab/<sha256>.gif.
+    Повторная загрузка того же файла возвращает имя уже сохраненного
+    и ничего не пишет, так что один файл может быть у многих постов:
+    delete() удаляет его у всех. Файл пишется потоком с подсчетом хеша
+    во временный в том же каталоге и переименовывается на место,
+    поэтому недописанный файл под хешем не появляется. Загрузку,
+    которую core.uploads.HashingFileUploadHandler уже записал на диск
+    и посчитал, остается только переименовать.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # Одинаковое содержимое и должно получать одно имя, а имя
+        # загрузки все равно заменяется хешем в _save.
+        return name
+
+    def content_name(self, name, digest):
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        temporary = getattr(content, 'temporary_file_path', None)
+        if temporary is not None:
+            digest = getattr(content, 'content_hash', None) or file_hash(
+                temporary())
+            return self._store(
+                self.content_name(name, digest), temporary(), move=True)
+        if not content.multiple_chunks():
+            # Файл в памяти: хеш считается до записи, и копия
+            # на диск не попадает вовсе.
+            digest = hashlib.sha256()
+            for chunk in content.chunks():
+                digest.update(chunk)
+            existing = self.content_name(name, digest.hexdigest())
+            if self.exists(existing):
+                return existing
+        source, digest = self._spool(content)
+        return self._store(self.content_name(name, digest), source)
+
+    def _spool(self, content):
+        """Пишет content во временный файл, считая хеш; (путь, хеш)."""
+        os.makedirs(self.location, exist_ok=True)
+        digest = hashlib.sha256()
+        with tempfile.NamedTemporaryFile(
+                dir=self.location, prefix='.upload-', delete=False) as spool:
+            try:
+                for chunk in content.chunks():
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    spool.write(chunk)
+            except BaseException:
+                spool.close()
+                os.remove(spool.name)
+                raise
+        return spool.name, digest.hexdigest()
+
+    def _store(self, name, source, move=False):
+        path = self.path(name)
+        if os.path.exists(path):
+            if not move:
+                os.remove(source)
+            return name
+        directory = os.path.dirname(path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0)
+            try:
+                os.makedirs(directory, self.directory_permissions_mode,
+                            exist_ok=True)
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        # Гонка двух одинаковых загрузок безопасна: замена файла тем же
+        # содержимым.
+        if move:
+            file_move_safe(source, path, allow_overwrite=True)
+        else:
+            os.replace(source, path)
+        # Временные файлы создаются с правами 0600.
+        os.chmod(path, self.file_permissions_mode or 0o644)
+        return name
@@ -0,0 +1,154 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial, wraps
+
+from django.template.base import Template
+from django.template.defaulttags import URLNode
+from django.template.library import InclusionNode
+from django.template.loader_tags import IncludeNode
+
+_active = threading.local()
+
+
+class Timing:
+    """Число вызовов и время в мс; own - без вложенных шаблонов."""
+
+    __slots__ = ('calls', 'total_ms', 'own_ms')
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.own_ms = 0.0
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'total_ms': round(self.total_ms, 2),
+            'own_ms': round(self.own_ms, 2),
+        }
+
+
+class TemplateProfile:
+    """
+    Время рендеринга по шаблонам и по тегам {% include %}, {% url %}
+    и inclusion-тегам. Шаблон, подключенный через extends, include
+    или inclusion-тег, считается отдельно; время тега включает время
+    подключенного им шаблона.
+    """
+
+    def __init__(self):
+        self.templates = {}
+        self.tags = {}
+        # Время внешних рендерингов: вложенные в них уже входят.
+        self.total_ms = 0.0
+        # Время вложенных шаблонов для каждого рендерящегося сейчас.
+        self._nested = []
+
+    def timing(self, table, key):
+        if key not in table:
+            table[key] = Timing()
+        return table[key]
+
+    def record(self, kind, key, render):
+        """
+        Рендерит и записывает время в templates или tags. Шаблон
+        целиком вычитается из собственного времени родителя; тег -
+        только тем, что потрачено во вложенных шаблонах.
+        """
+        self._nested.append(0.0)
+        started = time.perf_counter()
+        try:
+            return render()
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += (
+                    elapsed if kind == 'templates' else nested)
+            else:
+                self.total_ms += elapsed
+            timing = self.timing(getattr(self, kind), key)
+            timing.calls += 1
+            timing.total_ms += elapsed
+            timing.own_ms += elapsed - nested
+
+    def report(self, limit=None):
+        """Шаблоны по собственному времени, теги - по полному."""
+        templates = sorted(
+            self.templates.items(), key=lambda item: -item[1].own_ms)
+        tags = sorted(self.tags.items(), key=lambda item: -item[1].total_ms)
+        return {
+            'templates': {
+                name: timing.as_dict() for name, timing in templates[:limit]},
+            'tags': {key: timing.as_dict() for key, timing in tags[:limit]},
+        }
+
+
+def _record(kind, key, render):
+    """Записывает рендеринг во все активные профили потока."""
+    for profile in getattr(_active, 'profiles', ()):
+        render = partial(profile.record, kind, key, render)
+    return render()
+
+
+def _literal(expression):
+    """Строка из шаблона без кавычек: "includes/x.html" -> includes/x.html."""
+    token = getattr(expression, 'token', None) or str(expression)
+    return token.strip('"\'')
+
+
+def _profiled_render(render):
+    @wraps(render)
+    def inner(self, context):
+        if not getattr(_active, 'profiles', None):
+            return render(self, context)
+        name = self.origin.template_name or self.name or '<string>'
+        return _record('templates', name, partial(render, self, context))
+    inner.profiled = True
+    return inner
+
+
+def _profiled_tag(render, key):
+    @wraps(render)
+    def inner(self, context):
+        if not getattr(_active, 'profiles', None):
+            return render(self, context)
+        return _record('tags', key(self), partial(render, self, context))
+    inner.profiled = True
+    return inner
+
+
+def install():
+    """
+    Подменяет методы рендеринга один раз. Без активных профилей
+    подмены лишь проверяют thread-local и вызывают оригинал.
+    Вызывать при каждой активации: тестовое окружение Django само
+    подменяет и восстанавливает Template._render.
+    """
+    if not getattr(Template._render, 'profiled', False):
+        Template._render = _profiled_render(Template._render)
+    tags = (
+        (IncludeNode, lambda node: f'include {_literal(node.template)}'),
+        (URLNode, lambda node: f'url {_literal(node.view_name)}'),
+        (InclusionNode, lambda node: f'inclusion {node.func.__name__}'),
+    )
+    for node, key in tags:
+        if not getattr(node.render, 'profiled', False):
+            node.render = _profiled_tag(node.render, key)
+
+
+@contextmanager
+def profile_templates():
+    """
+    Собирает TemplateProfile всех рендерингов в этом потоке.
+    Вложенные профили не мешают друг другу: запись идет во все.
+    """
+    install()
+    profile = TemplateProfile()
+    profiles = _active.profiles = getattr(_active, 'profiles', [])
+    profiles.append(profile)
+    try:
+        yield profile
+    finally:
+        profiles.remove(profile)
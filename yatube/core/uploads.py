@@ -0,0 +1,29 @@
+import hashlib
+import os
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет большую загрузку на диск по мере прихода и заодно считает
+    ее sha256: ContentAddressedStorage берет готовый content_hash и не
+    перечитывает файл. FILE_UPLOAD_TEMP_DIR лучше держать в MEDIA_ROOT -
+    тогда сохранение файла сводится к переименованию.
+    """
+
+    def new_file(self, *args, **kwargs):
+        if settings.FILE_UPLOAD_TEMP_DIR:
+            os.makedirs(settings.FILE_UPLOAD_TEMP_DIR, exist_ok=True)
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.content_hash = self.digest.hexdigest()
+        return uploaded
@@ -0,0 +1,110 @@
+"""
+Прогрев процесса до первого запроса: компиляция шаблонов (остаются
+в кеше cached.Loader), разбор URLconf и подключение к БД.
+"""
+import os
+import time
+
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError, engines
+from django.template.utils import get_app_template_dirs
+from django.urls import NoReverseMatch, URLResolver, get_resolver, reverse
+
+TEMPLATE_EXTENSIONS = ('.html', '.txt', '.xml')
+
+
+def template_names(engine):
+    """Имена всех шаблонов из DIRS движка и каталогов templates/ app."""
+    directories = list(engine.dirs) + list(get_app_template_dirs('templates'))
+    names = []
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                if filename.endswith(TEMPLATE_EXTENSIONS):
+                    path = os.path.join(root, filename)
+                    names.append(os.path.relpath(path, directory).replace(
+                        os.sep, '/'))
+    # Одноименный шаблон из нескольких каталогов загрузчик отдаст один.
+    return list(dict.fromkeys(names))
+
+
+def compile_templates():
+    """
+    Компилирует шаблоны всех движков Django. Возвращает число
+    скомпилированных и словарь {имя: ошибка} для остальных.
+    """
+    compiled, errors = 0, {}
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None:
+            continue
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except TemplateDoesNotExist:
+                # Каталог app, который загрузчики движка не читают.
+                continue
+            except TemplateSyntaxError as error:
+                errors[name] = str(error)
+            else:
+                compiled += 1
+    return compiled, errors
+
+
+def url_names(resolver, prefix=''):
+    """Полные имена URL с пространствами имен: 'posts:index'."""
+    names = []
+    for pattern in resolver.url_patterns:
+        if isinstance(pattern, URLResolver):
+            namespace = (
+                f'{prefix}{pattern.namespace}:' if pattern.namespace
+                else prefix)
+            names.extend(url_names(pattern, namespace))
+        elif pattern.name:
+            names.append(prefix + pattern.name)
+    return names
+
+
+def reverse_urls():
+    """
+    Заполняет кеши резолвера и компилирует регулярные выражения
+    маршрутов, разворачивая каждый именованный URL. Маршрутам
+    с параметрами хватает попытки без аргументов: кеши заполняются
+    и на NoReverseMatch. Возвращает число имен.
+    """
+    names = url_names(get_resolver())
+    for name in names:
+        try:
+            reverse(name)
+        except NoReverseMatch:
+            pass
+    return len(names)
+
+
+def prime_database(close=True):
+    """
+    Подключается к каждой БД и выполняет пустой запрос: загружаются
+    драйвер и настройки соединения. close=True закрывает соединения
+    после прогрева - открытое соединение нельзя делить между
+    процессами после fork.
+    """
+    for connection in connections.all():
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+    if close:
+        connections.close_all()
+    return len(connections.all())
+
+
+def warmup(close_connections=True):
+    """Весь прогрев; возвращает {шаг: (результат, мс)}."""
+    steps = {}
+    for name, step in (
+        ('templates', compile_templates),
+        ('urls', reverse_urls),
+        ('databases', lambda: prime_database(close_connections)),
+    ):
+        started = time.perf_counter()
+        result = step()
+        steps[name] = (result, (time.perf_counter() - started) * 1000)
+    return steps
@@ -1,6 +1,84 @@
-from django.contrib import admin
+import logging
+from functools import partial
 
+from django import forms
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db import DatabaseError
+from django.forms.utils import flatatt
+from django.template.response import TemplateResponse
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from .bulk import Progress, delete_posts, move_posts
 from .models import Group, Post
+from .search import filter_posts
+from .utils import CachedCountPaginator, fetch_page_queryset
+
+EXCERPT_LENGTH = 100
+
+logger = logging.getLogger(__name__)
+
+
+class PlainSelect(forms.Select):
+    """
+    Select, у которого варианты собираются строкой, а не шаблоном
+    на каждый option: в списке постов сотня строк по select'у групп.
+    Варианты, отрисованные заранее (prerender), общие у всех копий
+    виджета в формах строк.
+    """
+
+    rendered_options = None
+
+    def prerender(self):
+        self.rendered_options = [
+            (
+                str(option),
+                format_html('<option value="{}"', option),
+                format_html('>{}</option>', label)
+            )
+            for option, label in self.choices
+        ]
+
+    def render(self, name, value, attrs=None, renderer=None):
+        if self.rendered_options is None:
+            self.prerender()
+        value = '' if value is None else str(value)
+        options = ''.join(
+            start + (' selected' if option == value else '') + end
+            for option, start, end in self.rendered_options
+        )
+        attrs = self.build_attrs(self.attrs, {**(attrs or {}), 'name': name})
+        return format_html(
+            '<select{}>{}</select>', flatatt(attrs), mark_safe(options))
+
+
+def excerpt_posts(queryset):
+    """
+    Посты без полного текста: в списке нужно только его начало.
+    extra, а не annotate: иначе COUNT(*) пойдет через GROUP BY.
+    """
+    return queryset.defer('text').extra(
+        select={'text_excerpt': 'SUBSTR(posts_post.text, 1, %s)'},
+        select_params=(EXCERPT_LENGTH,)
+    )
+
+
+class PostAdminPaginator(CachedCountPaginator):
+    # Формам list_editable страница нужна в виде QuerySet.
+    fetch_page = staticmethod(fetch_page_queryset)
+
+    def page_base(self):
+        return excerpt_posts(super().page_base())
+
+
+class PostActionForm(helpers.ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        required=False,
+        label='Группа',
+        help_text='Для действия «Перенести в группу»'
+    )
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -15,8 +93,145 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
-    list_editable = ('group', 'text')
+    list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
+    paginator = PostAdminPaginator
+    show_full_result_count = False
+    action_form = PostActionForm
+    actions = ('move_to_group', 'clear_group', 'delete_posts')
+
+    def get_queryset(self, request):
+        return excerpt_posts(super().get_queryset(request))
+
+    def get_list_display(self, request):
+        return tuple(
+            'text_excerpt' if name == 'text' else name
+            for name in super().get_list_display(request)
+        )
+
+    def text_excerpt(self, post):
+        if len(post.text_excerpt) < EXCERPT_LENGTH:
+            return post.text_excerpt
+        return post.text_excerpt + '…'
+    text_excerpt.short_description = 'Текст поста'
+    text_excerpt.admin_order_field = 'text'
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        # Без фильтров и поиска в списке все посты - их количество
+        # то же, что у главной ленты.
+        count_key = None if queryset.query.where else 'all'
+        return self.paginator(
+            queryset, per_page, orphans, allow_empty_first_page,
+            count_key=count_key
+        )
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs.setdefault(
+            'formfield_callback',
+            partial(self.changelist_formfield, request=request)
+        )
+        return super().get_changelist_formset(request, **kwargs)
+
+    def changelist_formfield(self, db_field, request, **kwargs):
+        """
+        Поле группы в строках списка: обычный select, варианты которого
+        запрашиваются и отрисовываются один раз на страницу.
+        """
+        if db_field.name != 'group':
+            return self.formfield_for_dbfield(db_field, request, **kwargs)
+        # Без обертки со ссылками «добавить/изменить» в каждой строке.
+        kwargs['widget'] = PlainSelect
+        field = self.formfield_for_foreignkey(db_field, request, **kwargs)
+        # Не list(): он спросил бы у ModelChoiceIterator еще и COUNT(*).
+        field.choices = [choice for choice in field.choices]
+        field.widget.prerender()
+        return field
+
+    def get_actions(self, request):
+        # Стандартное удаление грузит в память все посты с каскадом.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def run_bulk(self, request, bulk, *args):
+        """
+        Запускает move_posts или delete_posts и возвращает их Progress.
+        Пачки коммитятся по одной, поэтому при ошибке базы сообщает,
+        сколько постов уже обработано, и возвращает None.
+        """
+        progress = Progress()
+        try:
+            bulk(*args, progress=progress)
+        except DatabaseError:
+            logger.exception('Пакетное действие над постами прервано')
+            self.message_user(
+                request,
+                f'Действие прервано ошибкой базы данных. Уже обработано: '
+                f'{progress}; остальные посты не изменены.',
+                messages.ERROR)
+            return None
+        return progress
+
+    def move_to_group(self, request, queryset):
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        group = form.cleaned_data['group'] if form.is_valid() else None
+        if group is None:
+            self.message_user(
+                request, 'Выберите группу, в которую перенести посты.',
+                messages.WARNING)
+            return
+        progress = self.run_bulk(request, move_posts, queryset, group)
+        if progress is not None:
+            self.message_user(
+                request, f'Перенесено в группу «{group}»: {progress}.')
+    move_to_group.short_description = 'Перенести в группу'
+    move_to_group.allowed_permissions = ('change',)
+
+    def clear_group(self, request, queryset):
+        progress = self.run_bulk(request, move_posts, queryset, None)
+        if progress is not None:
+            self.message_user(request, f'Убрано из групп: {progress}.')
+    clear_group.short_description = 'Убрать из группы'
+    clear_group.allowed_permissions = ('change',)
+
+    def delete_posts(self, request, queryset):
+        if request.POST.get('post') == 'yes':
+            progress = self.run_bulk(request, delete_posts, queryset)
+            if progress is not None:
+                self.message_user(request, f'Удалено: {progress}.')
+            return
+        # Подтверждение без списка удаляемых объектов: при «выбрать все»
+        # форма передает select_across и фильтры в адресе, а id - только
+        # отмеченные на странице.
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Удалить посты?',
+            'opts': self.model._meta,
+            'count': queryset.count(),
+            'select_across': request.POST.get('select_across') == '1',
+            'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+        }
+        request.current_app = self.admin_site.name
+        return TemplateResponse(
+            request, 'admin/posts/delete_posts_confirmation.html', context)
+    delete_posts.short_description = 'Удалить посты'
+    delete_posts.allowed_permissions = ('delete',)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Вместо LIKE '%...%' по всей таблице - отбор по индексу FTS5.
+        return filter_posts(queryset, search_term), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+
+    list_display = ('pk', 'title', 'slug', 'posts_count')
+    search_fields = ('title', 'slug')
+    empty_value_display = '-пусто-'
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
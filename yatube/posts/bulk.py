@@ -0,0 +1,138 @@
+import logging
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .cache import GLOBAL_SCOPE, invalidate_fragments, touch_scopes
+from .counters import change_author_counts, change_group_counts
+from .models import Post
+from .signals import count_keys
+from .utils import invalidate_counts
+
+logger = logging.getLogger(__name__)
+
+
+def id_chunks(queryset, chunk_size=None):
+    """
+    id постов queryset пачками по chunk_size, по возрастанию id.
+    Следующая пачка ищется от последнего id, поэтому обработанные
+    строки могут выпадать из queryset (например, при смене группы).
+    """
+    chunk_size = chunk_size or settings.POSTS_BULK_CHUNK_SIZE
+    ids = queryset.order_by('pk').values_list('pk', flat=True)
+    last_id = None
+    while True:
+        chunk = ids if last_id is None else ids.filter(pk__gt=last_id)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1]
+
+
+def _posts_by_owner(ids):
+    """Сколько постов пачки у каждой пары (автор, группа)."""
+    return Counter({
+        (row['author_id'], row['group_id']): row['total']
+        for row in (
+            Post.objects.filter(pk__in=ids).order_by()
+            .values('author_id', 'group_id').annotate(total=Count('pk'))
+        )
+    })
+
+
+class Progress:
+    """Ход пакетного действия: сколько постов и пачек уже обработано."""
+
+    def __init__(self):
+        self.total = 0
+        self.done = 0
+        self.chunks = 0
+        self.started = time.monotonic()
+
+    def __str__(self):
+        elapsed = time.monotonic() - self.started
+        return (
+            f'{self.done} из {self.total} постов, пачек: {self.chunks}, '
+            f'{elapsed:.1f} с'
+        )
+
+
+def _run_in_chunks(queryset, action, name, chunk_size=None, progress=None):
+    """
+    Применяет action(ids, owners) к queryset пачками, каждая пачка -
+    в своей транзакции. Ход пишется в progress (Progress): при ошибке
+    в нем видно, сколько пачек уже закоммичено. Возвращает число
+    обработанных постов.
+    """
+    progress = progress or Progress()
+    progress.total = queryset.count()
+    keys = set()
+    try:
+        for ids in id_chunks(queryset, chunk_size):
+            with transaction.atomic():
+                owners = _posts_by_owner(ids)
+                action(ids, owners)
+            invalidate_fragments(ids)
+            for author_id, group_id in owners:
+                keys.update(count_keys(author_id, group_id))
+            progress.done += len(ids)
+            progress.chunks += 1
+            logger.info('%s: %s', name, progress)
+    finally:
+        # Закоммиченные пачки уже в базе, даже если следующая упала.
+        invalidate_counts(*keys)
+        if settings.POSTS_ANONYMOUS_PAGE_CACHE:
+            touch_scopes(GLOBAL_SCOPE)
+    logger.info('%s: готово, %s', name, progress)
+    return progress.done
+
+
+def move_posts(queryset, group, chunk_size=None, progress=None):
+    """Переносит посты в группу (None - убирает из групп)."""
+    group_id = group.pk if group is not None else None
+
+    def move(ids, owners):
+        Post.objects.filter(pk__in=ids).update(
+            group_id=group_id, edited=timezone.now())
+        authors = Counter()
+        moved = Counter()
+        for (author_id, old_group_id), total in owners.items():
+            authors[author_id] += 0
+            if old_group_id != group_id:
+                moved[old_group_id] -= total
+                moved[group_id] += total
+        change_author_counts(authors)
+        change_group_counts(moved)
+
+    return _run_in_chunks(
+        queryset, move, 'Перенос постов', chunk_size, progress)
+
+
+def delete_posts(queryset, chunk_size=None, progress=None):
+    """
+    Удаляет посты одним DELETE на пачку, не загружая объекты
+    и без сигналов: счетчики и кеши поправляются здесь же.
+    """
+    def delete(ids, owners):
+        # У поста нет зависимых моделей, так что каскад не нужен.
+        with connections[router.db_for_write(Post)].cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Post._meta.db_table} WHERE id IN '
+                f'({", ".join(["%s"] * len(ids))})',
+                ids
+            )
+        authors = Counter()
+        groups = Counter()
+        for (author_id, group_id), total in owners.items():
+            authors[author_id] -= total
+            groups[group_id] -= total
+        change_author_counts(authors)
+        change_group_counts(groups)
+
+    return _run_in_chunks(
+        queryset, delete, 'Удаление постов', chunk_size, progress)
@@ -0,0 +1,138 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+FRAGMENT_CACHE_KEY = 'posts:fragment:{}'
+RELATED_VERSION_KEY = 'posts:fragment-version:{}:{}'
+PAGE_CACHE_KEY = 'posts:page:{}:{}:{}'
+SCOPE_VERSION_KEY = 'posts:scope:{}'
+# Правки групп и пользователей задевают карточки во всех лентах.
+GLOBAL_SCOPE = 'all'
+INVALIDATE_BATCH_SIZE = 500
+
+
+def fragment_key(post_id):
+    return FRAGMENT_CACHE_KEY.format(post_id)
+
+
+def related_version_keys(post):
+    """Ключи версий автора и группы поста: их правка меняет карточку."""
+    keys = [RELATED_VERSION_KEY.format('author', post.author_id)]
+    if post.group_id is not None:
+        keys.append(RELATED_VERSION_KEY.format('group', post.group_id))
+    return keys
+
+
+def fragment_version(post, related):
+    """
+    Версия поста, при смене которой фрагмент считается устаревшим:
+    его даты и версии автора и группы из related.
+    """
+    return (
+        post.pub_date.timestamp(), post.edited.timestamp(),
+        *(related[key] for key in related_version_keys(post))
+    )
+
+
+def get_fragments(posts):
+    """
+    Закешированные карточки постов и версии всех карточек, одним
+    запросом к кешу: ({post_id: html}, {post_id: версия}).
+    """
+    version_keys = {
+        key for post in posts for key in related_version_keys(post)}
+    cached = cache.get_many(
+        [fragment_key(post.pk) for post in posts] + list(version_keys))
+    missing = {
+        key: time.time() for key in version_keys if key not in cached}
+    if missing:
+        cache.set_many(missing, None)
+        cached.update(missing)
+    fragments, versions = {}, {}
+    for post in posts:
+        versions[post.pk] = fragment_version(post, cached)
+        version, html = cached.get(fragment_key(post.pk), (None, None))
+        if version == versions[post.pk]:
+            fragments[post.pk] = html
+    return fragments, versions
+
+
+def set_fragment(post, html, version):
+    cache.set(
+        fragment_key(post.pk),
+        (version, html),
+        settings.POSTS_FRAGMENT_CACHE_TIMEOUT
+    )
+
+
+def touch_fragments(kind, object_id):
+    """
+    Делает устаревшими карточки всех постов автора или группы
+    (kind - 'author' или 'group') одной записью в кеш.
+    """
+    cache.set(RELATED_VERSION_KEY.format(kind, object_id), time.time(), None)
+
+
+def invalidate_fragments(post_ids):
+    """Сбрасывает карточки постов; post_ids может быть итератором."""
+    batch = []
+    for post_id in post_ids:
+        batch.append(fragment_key(post_id))
+        if len(batch) == INVALIDATE_BATCH_SIZE:
+            cache.delete_many(batch)
+            batch = []
+    if batch:
+        cache.delete_many(batch)
+
+
+def scope_versions(*scopes):
+    """Текущие версии выборок страниц; отсутствующие заводятся заново."""
+    keys = {SCOPE_VERSION_KEY.format(scope): scope for scope in scopes}
+    versions = cache.get_many(keys)
+    missing = {key: time.time() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[SCOPE_VERSION_KEY.format(scope)] for scope in scopes]
+
+
+def touch_scopes(*scopes):
+    """Делает устаревшими страницы перечисленных выборок."""
+    now = time.time()
+    cache.set_many(
+        {SCOPE_VERSION_KEY.format(scope): now for scope in scopes}, None)
+
+
+def anonymous_page_cache(scope, kwarg=None):
+    """
+    Кеширует ответ view целиком для анонимных читателей.
+    Ключ - выборка (scope или scope:<значение kwarg>), ее версия
+    и путь с параметрами ?page=/?cursor=. Включается
+    POSTS_ANONYMOUS_PAGE_CACHE.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                not settings.POSTS_ANONYMOUS_PAGE_CACHE
+                or request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            name = scope if kwarg is None else f'{scope}:{kwargs[kwarg]}'
+            version = '-'.join(
+                str(value) for value in scope_versions(GLOBAL_SCOPE, name))
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = PAGE_CACHE_KEY.format(name, version, path)
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(
+                        key, response, settings.POSTS_PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,98 @@
+import hashlib
+
+from django.db.models import Max, Subquery
+from django.views.decorators.http import condition
+
+from .models import AuthorStats, FeedStats, Group, Post
+
+
+def latest_change(model):
+    return Subquery(
+        model.objects.filter(posts_changed__isnull=False)
+        .order_by('-posts_changed')
+        .values('posts_changed')[:1]
+    )
+
+
+def index_changed():
+    """
+    Последнее изменение среди всех постов, авторов и групп, одним
+    запросом. Отметка удалений FeedStats не дает ему уйти назад,
+    когда удаляется автор или группа с последней отметкой.
+    Без авторов постов нет, и отметки тоже нет.
+    """
+    row = AuthorStats.objects.aggregate(
+        authors=Max('posts_changed'),
+        groups=Max(latest_change(Group)),
+        deleted=Max(latest_change(FeedStats)),
+    )
+    changed = [value for value in row.values() if value is not None]
+    return max(changed) if changed else None
+
+
+def latest(row):
+    if row is None:
+        return None
+    changed = [value for value in row if value is not None]
+    return max(changed) if changed else None
+
+
+def group_changed(slug):
+    """Посты группы и правки их авторов (общая отметка FeedStats)."""
+    return latest(
+        Group.objects.filter(slug=slug)
+        .values_list('posts_changed', latest_change(FeedStats))
+        .first()
+    )
+
+
+def author_changed(username):
+    """Посты автора и правки их групп (общая отметка FeedStats)."""
+    return latest(
+        AuthorStats.objects.filter(author__username=username)
+        .values_list('posts_changed', latest_change(FeedStats))
+        .first()
+    )
+
+
+def post_changed(post_id):
+    """Изменение самого поста, его группы и счетчика постов автора."""
+    row = (
+        Post.objects.filter(pk=post_id)
+        .values_list(
+            'edited', 'author__post_stats__posts_changed',
+            'group__posts_changed')
+        .first()
+    )
+    return latest(row)
+
+
+def conditional_page(changed_func):
+    """
+    ETag и Last-Modified по отметке изменения выборки: на повторный
+    запрос с тем же валидатором отвечаем 304 до отрисовки шаблона.
+    changed_func получает именованные аргументы view.
+    """
+    def changed(request, **kwargs):
+        if not hasattr(request, '_posts_changed'):
+            request._posts_changed = changed_func(**kwargs)
+        return request._posts_changed
+
+    def etag(request, *args, **kwargs):
+        value = changed(request, **kwargs)
+        if value is None:
+            return None
+        raw = (
+            f'{value.timestamp()}:{request.user.pk}:'
+            f'{request.get_full_path()}'
+        )
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        # Шапка зависит от пользователя, поэтому для вошедших
+        # полагаемся только на ETag.
+        if request.user.is_authenticated:
+            return None
+        return changed(request, **kwargs)
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
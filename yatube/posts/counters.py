@@ -0,0 +1,111 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import AuthorStats, FeedStats, Group, Post
+
+
+def change_author_count(author_id, delta=0):
+    """
+    Атомарно сдвигает счетчик постов автора на delta
+    и отмечает время изменения его постов.
+    """
+    with transaction.atomic():
+        if delta > 0:
+            # При каскадном удалении автора строку заново не создаем.
+            AuthorStats.objects.get_or_create(author_id=author_id)
+        _change_count(AuthorStats.objects.filter(pk=author_id), delta)
+
+
+def change_group_count(group_id, delta=0):
+    """
+    Атомарно сдвигает счетчик постов группы на delta
+    и отмечает время изменения ее постов.
+    """
+    if group_id is not None:
+        _change_count(Group.objects.filter(pk=group_id), delta)
+
+
+def touch_feed():
+    """Отмечает удаление или правку автора или группы (см. FeedStats)."""
+    FeedStats.objects.update_or_create(
+        pk=1, defaults={'posts_changed': timezone.now()})
+
+
+def change_author_counts(deltas):
+    """
+    Как change_author_count для многих авторов сразу: deltas -
+    {author_id: delta}, один UPDATE на каждое значение delta.
+    """
+    with transaction.atomic():
+        AuthorStats.objects.bulk_create(
+            [
+                AuthorStats(author_id=author_id)
+                for author_id, delta in deltas.items() if delta > 0
+            ],
+            ignore_conflicts=True
+        )
+        _change_counts(AuthorStats, deltas)
+
+
+def change_group_counts(deltas):
+    """Как change_group_count для многих групп: {group_id: delta}."""
+    _change_counts(Group, deltas)
+
+
+def _change_counts(model, deltas):
+    by_delta = defaultdict(list)
+    for pk, delta in deltas.items():
+        if pk is not None:
+            by_delta[delta].append(pk)
+    for delta, pks in by_delta.items():
+        _change_count(model.objects.filter(pk__in=pks), delta)
+
+
+def _change_count(queryset, delta):
+    queryset.update(
+        posts_count=Greatest(F('posts_count') + delta, 0),
+        posts_changed=timezone.now()
+    )
+
+
+def _posts_count(field):
+    posts = (
+        Post.objects.order_by()
+        .filter(**{field: OuterRef('pk')})
+        .values(field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(posts), 0)
+
+
+@transaction.atomic
+def recount_post_counters(author_ids=None, group_ids=None):
+    """
+    Пересчитывает счетчики по таблице постов.
+    Без аргументов - для всех авторов и групп.
+    """
+    groups = Group.objects.all()
+    if group_ids is not None:
+        groups = groups.filter(pk__in=group_ids)
+    now = timezone.now()
+    groups.update(posts_count=_posts_count('group'), posts_changed=now)
+
+    stats = AuthorStats.objects.all()
+    authors = Post.objects.order_by().values_list('author', flat=True)
+    if author_ids is not None:
+        stats = stats.filter(pk__in=author_ids)
+        authors = authors.filter(author__in=author_ids)
+    existing = set(stats.values_list('pk', flat=True))
+    AuthorStats.objects.bulk_create(
+        (
+            AuthorStats(author_id=author_id)
+            for author_id in authors.distinct().iterator()
+            if author_id not in existing
+        )
+    )
+    stats.update(posts_count=_posts_count('author'), posts_changed=now)
@@ -0,0 +1,102 @@
+import csv
+import json
+import zlib
+
+from django.conf import settings
+
+from .models import Post
+
+FORMATS = ('jsonl', 'csv')
+# Поля совпадают с входом import_posts: выгрузку можно загрузить обратно.
+FIELDS = ('id', 'text', 'author', 'group', 'pub_date')
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def guess_format(path):
+    path = path.lower()
+    if path.endswith('.gz'):
+        path = path[:-3]
+    return 'csv' if path.endswith('.csv') else 'jsonl'
+
+
+def export_rows(queryset=None, chunk_size=None):
+    """
+    Посты словарями по возрастанию id. Строки читаются пачками
+    по chunk_size, каждая следующая - от последнего id (без OFFSET),
+    так что в памяти не больше одной пачки.
+    """
+    if queryset is None:
+        queryset = Post.objects.all()
+    chunk_size = chunk_size or settings.POSTS_BULK_CHUNK_SIZE
+    rows = queryset.order_by('pk').values_list(
+        'pk', 'text', 'author__username', 'group__slug', 'pub_date')
+    last_id = None
+    while True:
+        chunk = rows if last_id is None else rows.filter(pk__gt=last_id)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        for pk, text, author, group, pub_date in chunk:
+            yield {
+                'id': pk,
+                'text': text,
+                'author': author,
+                'group': group or '',
+                'pub_date': pub_date.isoformat(),
+            }
+        last_id = chunk[-1][0]
+
+
+class _Line:
+    """Буфер на одну строку для csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.DictWriter(_Line(), FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def encode_lines(lines, buffer_size=64 * 1024):
+    """Строки в байты кусками примерно по buffer_size."""
+    buffer = []
+    size = 0
+    for line in lines:
+        line = line.encode()
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def gzip_chunks(chunks):
+    """Сжимает поток байтов в gzip на лету."""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_stream(rows, fmt='jsonl', compress=False):
+    """Байты выгрузки rows в формате fmt, при compress - в gzip."""
+    lines = csv_lines(rows) if fmt == 'csv' else jsonl_lines(rows)
+    chunks = encode_lines(lines)
+    return gzip_chunks(chunks) if compress else chunks
@@ -6,10 +6,11 @@ from .models import Post
 class PostForm(forms.ModelForm):
     class Meta:
         model = Post
-        fields = ('text', 'group')
+        fields = ('text', 'group', 'image')
         labels = {
             'group': 'Группа для Вашего поста',
         }
         help_texts = {
             'group': 'выберите группу из списка или оставьте пустым',
+            'image': 'необязательно',
         }
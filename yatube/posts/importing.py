@@ -0,0 +1,231 @@
+import csv
+import json
+import sys
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .cache import GLOBAL_SCOPE, touch_scopes
+from .counters import change_author_counts, change_group_counts
+from .models import Group, ImportCheckpoint, Post, User
+from .signals import count_keys
+from .utils import invalidate_counts
+
+FORMATS = ('jsonl', 'csv')
+
+
+def guess_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+@contextmanager
+def open_source(path):
+    """Файл для чтения построчно; '-' - стандартный ввод."""
+    if path == '-':
+        yield sys.stdin
+        return
+    with open(path, encoding='utf-8', newline='') as source:
+        yield source
+
+
+def read_rows(source, fmt, skip=0):
+    """
+    Строки входа словарями, без загрузки файла целиком.
+    Первые skip строк пропускаются (без разбора JSON).
+    """
+    if fmt == 'csv':
+        rows = csv.DictReader(source)
+        yield from islice(rows, skip, None)
+        return
+    lines = (line for line in source if line.strip())
+    for line in islice(lines, skip, None):
+        yield json.loads(line)
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+class LookupCache:
+    """
+    id авторов по username и групп по slug. Незнакомые имена
+    запрашиваются одним запросом на пачку; отсутствующие в базе
+    можно создать (create_authors / create_groups).
+    """
+
+    def __init__(self, create_authors=False, create_groups=False):
+        self.authors = {}
+        self.groups = {}
+        self.create_authors = create_authors
+        self.create_groups = create_groups
+
+    def resolve(self, rows):
+        self._resolve(
+            self.authors, User, 'username',
+            {row.get('author') for row in rows},
+            self._new_author if self.create_authors else None
+        )
+        self._resolve(
+            self.groups, Group, 'slug',
+            {row.get('group') for row in rows},
+            self._new_group if self.create_groups else None
+        )
+
+    @staticmethod
+    def _resolve(cache, model, field, names, create):
+        missing = {name for name in names if name and name not in cache}
+        if not missing:
+            return
+        found = dict(
+            model.objects.filter(**{f'{field}__in': missing})
+            .values_list(field, 'pk')
+        )
+        cache.update(found)
+        if create is not None:
+            for name in missing - set(found):
+                cache[name] = create(name).pk
+
+    @staticmethod
+    def _new_author(username):
+        user = User(username=username)
+        user.set_unusable_password()
+        user.save()
+        return user
+
+    @staticmethod
+    def _new_group(slug):
+        return Group.objects.create(title=slug, slug=slug, description='')
+
+
+def insert_posts(posts, using='default'):
+    """
+    Вставляет пачку постов с заданными в них датами (и id, если они
+    заданы у всех). bulk_create заменил бы pub_date текущим временем
+    (auto_now_add), а выключать auto_now_add у общего поля модели
+    небезопасно: его видят все потоки процесса.
+    """
+    if not posts:
+        return
+    connection = connections[using]
+    with_pk = all(post.pk is not None for post in posts)
+    fields = [
+        field for field in Post._meta.concrete_fields
+        if with_pk or not field.primary_key
+    ]
+    rows = [
+        [field.get_db_prep_save(post_value(post, field), connection)
+         for field in fields]
+        for post in posts
+    ]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(field.column) for field in fields)
+    values = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {quote(Post._meta.db_table)} ({columns}) '
+            f'VALUES ({values})',
+            rows
+        )
+
+
+def post_value(post, field):
+    """Значение поля как есть; пустое - как его заполнил бы save()."""
+    value = getattr(post, field.attname)
+    return field.pre_save(post, True) if value is None else value
+
+
+def build_post(row, lookups, now):
+    """Post из строки входа или None, если строку не импортировать."""
+    text = (row.get('text') or '').strip()
+    author_id = lookups.authors.get(row.get('author'))
+    group_slug = row.get('group') or None
+    group_id = lookups.groups.get(group_slug)
+    if not text or author_id is None or (group_slug and group_id is None):
+        return None
+    pub_date = row.get('pub_date')
+    pub_date = parse_datetime(pub_date) if pub_date else None
+    if pub_date is None:
+        pub_date = now
+    elif timezone.is_naive(pub_date):
+        pub_date = timezone.make_aware(pub_date)
+    return Post(
+        text=text, author_id=author_id, group_id=group_id, pub_date=pub_date)
+
+
+class Checkpoint:
+    """
+    Сколько строк входа name уже обработано. Хранится строкой
+    ImportCheckpoint, которая пишется в транзакции пачки, и удаляется
+    по окончании импорта.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.state = {'rows': 0, 'imported': 0, 'skipped': 0}
+
+    def exists(self):
+        return ImportCheckpoint.objects.filter(name=self.name).exists()
+
+    def load(self):
+        saved = (
+            ImportCheckpoint.objects.filter(name=self.name)
+            .values(*self.state).first()
+        )
+        if saved is not None:
+            self.state.update(saved)
+        return self.state
+
+    def save(self, state):
+        """Записывает state; вызывается внутри транзакции пачки."""
+        ImportCheckpoint.objects.update_or_create(
+            name=self.name, defaults=state)
+
+    def clear(self):
+        ImportCheckpoint.objects.filter(name=self.name).delete()
+
+
+def import_posts(rows, checkpoint, batch_size, lookups, progress=None):
+    """
+    Вставляет посты пачками по batch_size, каждая пачка со своими
+    счетчиками и checkpoint - в одной транзакции. После пачки
+    вызывает progress(state). Возвращает итоговое состояние.
+    """
+    keys = set()
+    for batch in batches(rows, batch_size):
+        lookups.resolve(batch)
+        now = timezone.now()
+        posts = [build_post(row, lookups, now) for row in batch]
+        posts = [post for post in posts if post is not None]
+        authors = Counter(post.author_id for post in posts)
+        groups = Counter(post.group_id for post in posts)
+        state = {
+            'rows': checkpoint.state['rows'] + len(batch),
+            'imported': checkpoint.state['imported'] + len(posts),
+            'skipped':
+                checkpoint.state['skipped'] + len(batch) - len(posts),
+        }
+        with transaction.atomic():
+            insert_posts(posts)
+            change_author_counts(authors)
+            change_group_counts(groups)
+            checkpoint.save(state)
+        checkpoint.state = state
+        for author_id in authors:
+            keys.update(count_keys(author_id))
+        keys.update(count_keys(None, *groups))
+        if progress is not None:
+            progress(state)
+    invalidate_counts(*keys)
+    if settings.POSTS_ANONYMOUS_PAGE_CACHE:
+        touch_scopes(GLOBAL_SCOPE)
+    return checkpoint.state
@@ -0,0 +1,33 @@
+from django.conf import settings
+
+from core.lookups import LookupCache
+
+from .models import AuthorStats, Group, User
+
+# Только поля, которые не меняются вместе с постами: счетчики и отметки
+# изменений при обращении догружаются из БД.
+group_by_slug = LookupCache(
+    'group_by_slug', Group.objects.all(), 'slug',
+    ('id', 'slug', 'title', 'description'),
+    settings.POSTS_LOOKUP_CACHE_SIZE, settings.POSTS_LOOKUP_CACHE_TIMEOUT
+)
+author_by_username = LookupCache(
+    'author_by_username', User.objects.all(), 'username',
+    ('id', 'username', 'first_name', 'last_name'),
+    settings.POSTS_LOOKUP_CACHE_SIZE, settings.POSTS_LOOKUP_CACHE_TIMEOUT
+)
+
+
+def author_posts_count(page_obj, author):
+    """
+    Число постов автора: у постраничной ленты оно уже посчитано
+    paginator, ленте по курсору приходится читать счетчик.
+    """
+    paginator = getattr(page_obj, 'paginator', None)
+    if paginator is not None:
+        return paginator.count
+    count = (
+        AuthorStats.objects.filter(pk=author.pk)
+        .values_list('posts_count', flat=True).first()
+    )
+    return count or 0
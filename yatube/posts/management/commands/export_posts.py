@@ -0,0 +1,66 @@
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporting import FORMATS, export_rows, export_stream, guess_format
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает все посты (с username автора и slug группы) '
+        'в JSONL или CSV, при необходимости сжимая в gzip.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help="Файл выгрузки, '-' - stdout."
+        )
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжимать в gzip (включается само для *.gz).'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=settings.POSTS_BULK_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size должен быть больше нуля.')
+        compress = options['gzip'] or output.lower().endswith('.gz')
+        exported = 0
+
+        def counted(rows):
+            nonlocal exported
+            for exported, row in enumerate(rows, 1):
+                yield row
+
+        rows = counted(export_rows(chunk_size=options['chunk_size']))
+        stream = export_stream(
+            rows, options['format'] or guess_format(output), compress)
+        started = time.monotonic()
+        try:
+            if output == '-':
+                self.write(sys.stdout.buffer, stream)
+            else:
+                with open(output, 'wb') as target:
+                    self.write(target, stream)
+        except OSError as error:
+            raise CommandError(f'Выгрузка не записана: {error}')
+        elapsed = time.monotonic() - started
+        if options['verbosity']:
+            # При выгрузке в stdout отчет уходит в stderr.
+            report = self.stderr if output == '-' else self.stdout
+            report.write(
+                f'Выгружено постов: {exported} за {elapsed:.1f} с.',
+                self.style.SUCCESS
+            )
+
+    @staticmethod
+    def write(target, stream):
+        for chunk in stream:
+            target.write(chunk)
+        target.flush()
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import generate_for_post
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает недостающие миниатюры картинок постов и заново кладет '
+        'готовые в кеш kvstore (после импорта, генерации или сброса кеша).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=max(1, settings.POSTS_THUMBNAIL_WORKERS),
+            help='Потоков, по умолчанию POSTS_THUMBNAIL_WORKERS; '
+                 '0 - в этом же потоке.')
+
+    def handle(self, *args, **options):
+        post_ids = list(
+            Post.objects.exclude(image='').values_list('pk', flat=True))
+        if not options['workers']:
+            done = sum(
+                generate_for_post(post_id, close_connection=False)
+                for post_id in post_ids)
+        else:
+            with ThreadPoolExecutor(options['workers']) as pool:
+                done = sum(pool.map(generate_for_post, post_ids))
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры есть у {done} постов из {len(post_ids)}.'))
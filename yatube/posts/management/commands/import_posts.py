@@ -0,0 +1,104 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importing import (FORMATS, Checkpoint, LookupCache, guess_format,
+                             import_posts, open_source, read_rows)
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты из JSONL или CSV (поля text, author, group, '
+        'pub_date) пачками, с продолжением с места остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл с постами, '-' - stdin.")
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.POSTS_BULK_CHUNK_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            help='Имя, под которым в базе хранится прогресс импорта '
+                 '(по умолчанию - полный путь к файлу).'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить импорт с сохраненного прогресса.'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Забыть сохраненный прогресс и начать импорт заново.'
+        )
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Заводить отсутствующих авторов без пароля.'
+        )
+        parser.add_argument(
+            '--create-groups', action='store_true',
+            help='Заводить отсутствующие группы (заголовок - slug).'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or guess_format(path)
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        checkpoint = self.checkpoint(path, options)
+        lookups = LookupCache(
+            create_authors=options['create_authors'],
+            create_groups=options['create_groups']
+        )
+        started = time.monotonic()
+        resumed_from = checkpoint.state['rows']
+
+        def progress(state):
+            if options['verbosity'] > 1:
+                self.stdout.write(self.summary(state, started, resumed_from))
+
+        try:
+            with open_source(path) as source:
+                rows = read_rows(source, fmt, skip=resumed_from)
+                state = import_posts(
+                    rows, checkpoint, options['batch_size'], lookups, progress)
+        except (OSError, ValueError) as error:
+            raise CommandError(
+                f'Импорт остановлен после строки {checkpoint.state["rows"]}: '
+                f'{error}'
+            )
+        checkpoint.clear()
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(
+                'Импорт завершен: '
+                + self.summary(state, started, resumed_from)
+            ))
+
+    @staticmethod
+    def checkpoint(path, options):
+        name = options['checkpoint']
+        if name is None:
+            if path == '-':
+                raise CommandError('Для stdin укажите --checkpoint.')
+            name = os.path.abspath(path)
+        checkpoint = Checkpoint(name)
+        if options['restart']:
+            checkpoint.clear()
+        elif options['resume']:
+            checkpoint.load()
+        elif checkpoint.exists():
+            raise CommandError(
+                f'Есть незавершенный импорт ({name}): продолжите его '
+                'с --resume или начните заново с --restart.'
+            )
+        return checkpoint
+
+    @staticmethod
+    def summary(state, started, resumed_from):
+        elapsed = time.monotonic() - started
+        rate = (state['rows'] - resumed_from) / elapsed if elapsed else 0
+        return (
+            f'строк {state["rows"]}, импортировано {state["imported"]}, '
+            f'пропущено {state["skipped"]}, {rate:.0f} строк/с'
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from posts.search import rebuild_search_index, search_supported
+
+
+class Command(BaseCommand):
+    help = 'Заново строит полнотекстовый индекс постов (SQLite FTS5).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if not search_supported(using):
+            raise CommandError(
+                'Полнотекстовый индекс поддерживается только для SQLite.')
+        rebuild_search_index(using)
+        if options['verbosity']:
+            self.stdout.write(
+                self.style.SUCCESS('Поисковый индекс перестроен.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import recount_post_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики постов у авторов и групп.'
+
+    def handle(self, *args, **options):
+        recount_post_counters()
+        self.stdout.write(self.style.SUCCESS('Счетчики постов пересчитаны.'))
@@ -0,0 +1,94 @@
+import os
+import time
+from argparse import ArgumentTypeError
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts.cache import GLOBAL_SCOPE, touch_scopes
+from posts.counters import recount_post_counters
+from posts.seeding import Plan, seed
+from posts.utils import invalidate_counts
+
+
+def moment(value):
+    """Дата или дата со временем из ISO 8601; без зоны - в TIME_ZONE."""
+    parsed = parse_datetime(value)
+    if parsed is None:
+        date = parse_date(value)
+        if date is None:
+            raise ArgumentTypeError(f'Не дата: {value}')
+        parsed = datetime.combine(date, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами и постами '
+        'с перекосом по авторам, группам и датам. Одно и то же зерно '
+        'дает одни и те же данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--days', type=int, default=3 * 365,
+            help='На сколько дней назад растянуть даты постов.'
+        )
+        parser.add_argument(
+            '--until', type=moment,
+            help='Дата самого нового поста (ISO 8601), по умолчанию сейчас.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Процессы, вставляющие посты; 1 - без дочерних процессов.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        for option in ('users', 'groups', 'days', 'batch_size'):
+            if options[option] < 1:
+                raise CommandError(f'--{option} должен быть больше нуля.')
+        if options['posts'] < 0:
+            raise CommandError('--posts не может быть отрицательным.')
+        plan = Plan(
+            options['seed'], options['users'], options['groups'],
+            options['posts'], options['days'], options['batch_size'],
+            until=options['until']
+        )
+        started = time.monotonic()
+
+        def progress(inserted):
+            if options['verbosity'] > 1:
+                self.stdout.write(self.summary(inserted, started))
+
+        try:
+            inserted = seed(plan, options['workers'], progress)
+        except IntegrityError as error:
+            raise CommandError(
+                f'Данные с зерном {options["seed"]} уже есть в базе: {error}')
+        recount_post_counters()
+        invalidate_counts('all')
+        if settings.POSTS_ANONYMOUS_PAGE_CACHE:
+            touch_scopes(GLOBAL_SCOPE)
+        if options['verbosity']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Создано пользователей: {options["users"]}, '
+                f'групп: {options["groups"]}, постов: '
+                + self.summary(inserted, started)
+            ))
+
+    @staticmethod
+    def summary(inserted, started):
+        elapsed = time.monotonic() - started
+        rate = inserted / elapsed if elapsed else 0
+        return f'{inserted} ({rate:.0f} постов/с)'
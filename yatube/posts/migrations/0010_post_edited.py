@@ -0,0 +1,38 @@
+# Generated by Django 2.2.16 on 2026-10-18 01:28
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_change_dates(apps, schema_editor):
+    apps.get_model('posts', 'Post').objects.update(
+        edited=models.F('pub_date'))
+    now = timezone.now()
+    apps.get_model('posts', 'Group').objects.update(posts_changed=now)
+    apps.get_model('posts', 'AuthorStats').objects.update(posts_changed=now)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='posts_changed',
+            field=models.DateTimeField(db_index=True, null=True, verbose_name='Последнее изменение постов'),
+        ),
+        migrations.AddField(
+            model_name='group',
+            name='posts_changed',
+            field=models.DateTimeField(db_index=True, editable=False, null=True, verbose_name='Последнее изменение постов'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='edited',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата изменения'),
+        ),
+        migrations.RunPython(fill_change_dates, migrations.RunPython.noop),
+    ]
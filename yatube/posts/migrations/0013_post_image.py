@@ -0,0 +1,59 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:41
+
+from django.db import migrations, models
+
+# Копия триггеров из 0012_post_search: миграция не зависит от
+# текущего posts.search.
+SEARCH_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_post_fts_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO posts_post_fts (posts_post_fts, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO posts_post_fts (rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite меняет столбцы пересозданием posts_post, а с ним
+    # пропадают триггеры поискового индекса. Строки копируются с теми
+    # же id, так что сам индекс остается верным.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in SEARCH_TRIGGERS:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_search'),
+    ]
+
+    operations = [
+        # При откате триггеры восстанавливаются после RemoveField.
+        migrations.RunPython(
+            migrations.RunPython.noop, restore_search_triggers),
+        migrations.AddField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(
+            restore_search_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedStats',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_changed', models.DateTimeField(null=True, verbose_name='Последнее удаление автора или группы')),
+            ],
+            options={
+                'verbose_name': 'Статистика ленты',
+                'verbose_name_plural': 'Статистика ленты',
+            },
+        ),
+    ]
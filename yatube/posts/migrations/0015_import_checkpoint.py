@@ -0,0 +1,27 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feed_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Импорт')),
+                ('rows', models.PositiveIntegerField(default=0, verbose_name='Обработано строк')),
+                ('imported', models.PositiveIntegerField(default=0, verbose_name='Импортировано')),
+                ('skipped', models.PositiveIntegerField(default=0, verbose_name='Пропущено')),
+            ],
+            options={
+                'verbose_name': 'Прогресс импорта',
+                'verbose_name_plural': 'Прогресс импорта',
+            },
+        ),
+    ]
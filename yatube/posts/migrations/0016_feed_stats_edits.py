@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feedstats',
+            name='posts_changed',
+            field=models.DateTimeField(null=True, verbose_name='Последнее удаление или правка автора или группы'),
+        ),
+    ]
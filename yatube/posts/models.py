@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .search import search_posts
 from .validators import validate_not_empty
 
 User = get_user_model()
@@ -11,6 +12,17 @@ class Group(models.Model):
     title = models.CharField('Заголовок', max_length=200)
     slug = models.SlugField(unique=True, verbose_name='Уникальный адрес')
     description = models.TextField(verbose_name='Описание')
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
+    posts_changed = models.DateTimeField(
+        'Последнее изменение постов',
+        null=True,
+        db_index=True,
+        editable=False
+    )
 
     def __str__(self) -> str:
         return self.title
@@ -20,6 +32,17 @@ class Group(models.Model):
         verbose_name_plural = "Группы"
 
 
+class PostQuerySet(models.QuerySet):
+
+    def for_feed(self):
+        """Посты вместе с автором и группой одним запросом."""
+        return self.select_related('author', 'group')
+
+    def search(self, query, ranked=True):
+        """Полнотекстовый поиск по тексту, самые релевантные первыми."""
+        return search_posts(self, query, ranked)
+
+
 class Post(models.Model):
 
     text = models.TextField(
@@ -31,11 +54,17 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    edited = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
         related_name='posts',
-        verbose_name='Автор'
+        verbose_name='Автор',
+        # Покрывается составным индексом post_author_feed_idx.
+        db_index=False
     )
     group = models.ForeignKey(
         Group,
@@ -44,14 +73,111 @@ class Post(models.Model):
         null=True,
         related_name='groups',
         verbose_name='Группа',
-        help_text='Группа, к которой относится пост'
+        help_text='Группа, к которой относится пост',
+        # Покрывается составным индексом post_group_feed_idx.
+        db_index=False
+    )
+    image = models.ImageField(
+        'Картинка',
+        upload_to='posts/',
+        blank=True
     )
 
+    objects = PostQuerySet.as_manager()
+
     def __str__(self) -> str:
 
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем группу и автора из БД, чтобы счетчики заметили
+        # их смену.
+        if 'group_id' in instance.__dict__:
+            instance._loaded_group_id = instance.group_id
+        if 'author_id' in instance.__dict__:
+            instance._loaded_author_id = instance.author_id
+        return instance
+
     class Meta:
-        ordering = ["-pub_date"]
+        ordering = ["-pub_date", "-id"]
+        # Индексы под три ленты: группа, профиль и главная.
+        indexes = [
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_feed_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_feed_idx'
+            ),
+            models.Index(fields=['-pub_date', '-id'], name='post_feed_idx'),
+        ]
         verbose_name = "Пост"
         verbose_name_plural = "Посты"
+
+
+class AuthorStats(models.Model):
+
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='post_stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0
+    )
+    posts_changed = models.DateTimeField(
+        'Последнее изменение постов',
+        null=True,
+        db_index=True
+    )
+
+    def __str__(self) -> str:
+        return f'{self.author}: {self.posts_count}'
+
+    class Meta:
+        verbose_name = "Статистика автора"
+        verbose_name_plural = "Статистика авторов"
+
+
+class FeedStats(models.Model):
+    """
+    Одна строка с отметкой удаления или правки автора или группы.
+    Отметки удаленных пропадают вместе с ними, и без этой время
+    изменения главной ушло бы назад. Правка группы видна в профилях
+    ее авторов, а правка автора - в лентах его групп: общая отметка
+    дешевле, чем отмечать каждый профиль и каждую группу.
+    """
+
+    posts_changed = models.DateTimeField(
+        'Последнее удаление или правка автора или группы',
+        null=True
+    )
+
+    class Meta:
+        verbose_name = "Статистика ленты"
+        verbose_name_plural = "Статистика ленты"
+
+
+class ImportCheckpoint(models.Model):
+    """
+    Прогресс import_posts: пишется в той же транзакции, что и пачка
+    постов, поэтому после сбоя импорт не повторит и не потеряет пачку.
+    """
+
+    name = models.CharField('Импорт', max_length=255, unique=True)
+    rows = models.PositiveIntegerField('Обработано строк', default=0)
+    imported = models.PositiveIntegerField('Импортировано', default=0)
+    skipped = models.PositiveIntegerField('Пропущено', default=0)
+
+    def __str__(self) -> str:
+        return self.name
+
+    class Meta:
+        verbose_name = "Прогресс импорта"
+        verbose_name_plural = "Прогресс импорта"
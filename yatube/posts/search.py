@@ -0,0 +1,163 @@
+import re
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'posts_post_fts'
+POST_TABLE = 'posts_post'
+
+# Внешний контент: в индексе только токены, сам текст лежит в posts_post.
+# Триггеры держат индекс в согласии с таблицей постов.
+CREATE_SEARCH_INDEX = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        text,
+        content='{POST_TABLE}',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert
+    AFTER INSERT ON {POST_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete
+    AFTER DELETE ON {POST_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+    AFTER UPDATE OF text ON {POST_TABLE} BEGIN
+        INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {SEARCH_TABLE} (rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+DROP_SEARCH_INDEX = [
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update',
+    f'DROP TABLE IF EXISTS {SEARCH_TABLE}',
+]
+
+
+def search_supported(using='default'):
+    """Полнотекстовый индекс есть только у SQLite (FTS5)."""
+    return connections[using].vendor == 'sqlite'
+
+
+def create_search_index(using='default'):
+    if not search_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        for sql in CREATE_SEARCH_INDEX:
+            cursor.execute(sql)
+
+
+def drop_search_index(using='default'):
+    if not search_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        for sql in DROP_SEARCH_INDEX:
+            cursor.execute(sql)
+
+
+def rebuild_search_index(using='default'):
+    """Заново строит индекс по posts_post и сливает его сегменты."""
+    create_search_index(using)
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('rebuild')")
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) VALUES ('optimize')")
+
+
+def search_terms(query):
+    """Слова запроса без операторов и знаков препинания."""
+    return re.findall(r'\w+', query.lower())
+
+
+def match_expression(terms):
+    """
+    Выражение MATCH: каждое слово в кавычках, чтобы кавычки и NEAR
+    из запроса не ломали синтаксис FTS5. Последнее слово ищется
+    по префиксу: «котик» находит и «котиков». Префикс у всех слов
+    на миллионах постов заметно дороже.
+    """
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def count_matches(queryset, query, limit):
+    """Число найденных постов, но не больше limit."""
+    terms = search_terms(query)
+    if not terms:
+        return 0
+    if not search_supported(queryset.db):
+        return filter_posts(queryset, query).order_by()[:limit].count()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM (SELECT 1 FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s LIMIT %s)',
+            [match_expression(terms), limit]
+        )
+        return cursor.fetchone()[0]
+
+
+def search_posts(queryset, query, ranked=True):
+    """
+    Посты queryset, подходящие под запрос, от самых релевантных
+    (bm25) к менее релевантным, при равенстве - от новых к старым.
+    ranked=False - от новых к старым: FTS5 отдает их прямо из индекса,
+    не оценивая все совпадения. На других СУБД - поиск по вхождению
+    всех слов без ранжирования.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+    if not search_supported(queryset.db):
+        return filter_posts(queryset, query)
+    queryset = queryset.extra(
+        tables=[SEARCH_TABLE],
+        where=[
+            f'{SEARCH_TABLE}.rowid = {POST_TABLE}.id',
+            f'{SEARCH_TABLE} MATCH %s',
+        ],
+        params=[match_expression(terms)],
+    )
+    if not ranked:
+        return queryset.order_by(RawSQL(f'{SEARCH_TABLE}.rowid', ()).desc())
+    return queryset.order_by(
+        RawSQL(f'{SEARCH_TABLE}.rank', ()), '-pub_date', '-id')
+
+
+def filter_posts(queryset, query):
+    """
+    Только отбор по индексу, без ранжирования и JOIN:
+    порядок остается за queryset (например, в админке).
+    Пустой запрос ничего не отбрасывает.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+    if not search_supported(queryset.db):
+        for term in terms:
+            queryset = queryset.filter(text__icontains=term)
+        return queryset
+    # Не pk__in=RawSQL(...): Django оборачивает его во вторые скобки,
+    # и SQLite видит скалярный подзапрос с одной строкой.
+    return queryset.extra(
+        where=[
+            f'{POST_TABLE}.id IN (SELECT rowid FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s)'
+        ],
+        params=[match_expression(terms)],
+    )
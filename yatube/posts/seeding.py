@@ -0,0 +1,196 @@
+import math
+import multiprocessing
+import random
+from contextlib import nullcontext
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from .importing import batches, insert_posts
+from .models import Group, Post, User
+
+# Перекос как в живых блогах: немногие авторы пишут большую часть
+# постов, немногие группы собирают большую часть записей.
+AUTHOR_SKEW = 1.2
+GROUP_SKEW = 1.5
+# Доля постов без группы.
+NO_GROUP = 0.3
+MAX_SENTENCES = 12
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def pareto_weights(rnd, count, alpha):
+    """Накопленные веса для random.choices с тяжелым хвостом."""
+    return list(accumulate(rnd.paretovariate(alpha) for _ in range(count)))
+
+
+class Plan:
+    """
+    Что и из какого зерна генерировать. Пачка постов number
+    строится только из (seed, number), поэтому результат не зависит
+    от числа процессов и порядка, в котором они закончат работу.
+    """
+
+    def __init__(self, seed, users, groups, posts, days, batch_size,
+                 until=None):
+        self.seed = seed
+        self.posts = posts
+        self.batch_size = batch_size
+        self.first_user = next_id(User)
+        self.first_group = next_id(Group)
+        self.first_post = next_id(Post)
+        self.user_ids = range(self.first_user, self.first_user + users)
+        self.group_ids = range(self.first_group, self.first_group + groups)
+        rnd = random.Random(f'{seed}:weights')
+        self.author_weights = pareto_weights(rnd, users, AUTHOR_SKEW)
+        self.group_weights = pareto_weights(rnd, groups, GROUP_SKEW)
+        # Даты отсчитываются от until: с ним данные совпадают и по датам.
+        self.now = (until or timezone.now()).replace(microsecond=0)
+        self.span = timedelta(days=days)
+
+    @property
+    def batches(self):
+        return range(math.ceil(self.posts / self.batch_size))
+
+    def faker(self, *salt):
+        fake = Faker('ru_RU')
+        fake.seed_instance(f'{self.seed}:' + ':'.join(map(str, salt)))
+        return fake
+
+    def pub_date(self, index):
+        """
+        Даты идут по возрастанию вместе с id, а постов со временем
+        становится больше: плотность растет линейно к сегодняшнему дню.
+        """
+        share = math.sqrt((index + 1) / self.posts)
+        return self.now - self.span * (1 - share)
+
+    def users(self):
+        fake = self.faker('users')
+        latin = Faker('en_US')
+        latin.seed_instance(f'{self.seed}:users')
+        password = make_password(None)
+        for number, pk in enumerate(self.user_ids):
+            yield User(
+                pk=pk,
+                username=f'{latin.user_name()}{number}',
+                first_name=fake.first_name(),
+                last_name=fake.last_name(),
+                password=password,
+                date_joined=self.now - self.span,
+            )
+
+    def groups(self):
+        fake = self.faker('groups')
+        latin = Faker('en_US')
+        latin.seed_instance(f'{self.seed}:groups')
+        for number, pk in enumerate(self.group_ids):
+            yield Group(
+                pk=pk,
+                title=fake.sentence(nb_words=3).rstrip('.'),
+                slug=f'{latin.slug()}-{number}',
+                description=fake.paragraph(),
+            )
+
+    def batch(self, number):
+        """Посты пачки number с заранее известными id."""
+        rnd = random.Random(f'{self.seed}:posts:{number}')
+        fake = self.faker('posts', number)
+        start = number * self.batch_size
+        size = min(self.batch_size, self.posts - start)
+        authors = rnd.choices(
+            self.user_ids, cum_weights=self.author_weights, k=size)
+        groups = rnd.choices(
+            self.group_ids, cum_weights=self.group_weights, k=size)
+        posts = []
+        for offset, (author_id, group_id) in enumerate(zip(authors, groups)):
+            index = start + offset
+            # Длина поста тоже с тяжелым хвостом: много коротких.
+            sentences = min(int(rnd.paretovariate(1.5)), MAX_SENTENCES)
+            pub_date = self.pub_date(index)
+            posts.append(Post(
+                pk=self.first_post + index,
+                text=fake.paragraph(nb_sentences=sentences),
+                author_id=author_id,
+                group_id=None if rnd.random() < NO_GROUP else group_id,
+                pub_date=pub_date,
+                edited=pub_date,
+            ))
+        return posts
+
+
+_plan = None
+_write_lock = None
+
+
+def _start_worker(plan, write_lock=None):
+    global _plan, _write_lock
+    _plan = plan
+    _write_lock = write_lock
+
+
+def insert_batch(number):
+    """Строит и вставляет пачку постов; возвращает ее размер."""
+    posts = _plan.batch(number)
+    # Писатель у SQLite один, а столкнувшиеся транзакции он не ждет,
+    # а сразу отвечает «database is locked»: записи идут по очереди,
+    # генерация текстов - параллельно.
+    with _write_lock or nullcontext():
+        with transaction.atomic():
+            insert_posts(posts)
+    return len(posts)
+
+
+def seed(plan, workers=1, progress=None):
+    """
+    Заводит пользователей и группы, затем вставляет посты пачками
+    в workers процессах (при workers <= 1 - в текущем).
+    progress(inserted) вызывается после каждой пачки.
+    """
+    with transaction.atomic():
+        for users in batches(plan.users(), plan.batch_size):
+            User.objects.bulk_create(users)
+        for groups in batches(plan.groups(), plan.batch_size):
+            Group.objects.bulk_create(groups)
+    inserted = 0
+    if workers <= 1:
+        _start_worker(plan)
+        results = map(insert_batch, plan.batches)
+        pool = None
+    else:
+        # Дочерним процессам нужны свои соединения с базой.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        write_lock = context.Lock() if connection.vendor == 'sqlite' else None
+        pool = context.Pool(workers, _start_worker, (plan, write_lock))
+        results = pool.imap_unordered(insert_batch, plan.batches)
+    try:
+        for size in results:
+            inserted += size
+            if progress is not None:
+                progress(inserted)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+    reset_sequences()
+    return inserted
+
+
+def reset_sequences():
+    """Сдвигает автоинкремент за вставленные явно id (PostgreSQL и др.)."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), [User, Group, Post])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
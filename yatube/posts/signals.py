@@ -0,0 +1,169 @@
+from django.conf import settings
+from django.db.models.signals import (
+    post_delete, post_migrate, post_save, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.lookups import clear_lookups
+
+from .cache import (
+    GLOBAL_SCOPE, invalidate_fragments, touch_fragments, touch_scopes
+)
+from .counters import change_author_count, change_group_count, touch_feed
+from .lookups import author_by_username, group_by_slug
+from .models import AuthorStats, Group, Post, User
+from .thumbnails import schedule_thumbnails
+from .utils import invalidate_counts
+
+
+def count_keys(author_id, *group_ids):
+    """Ключи кеша количества постов, которые задевает пост."""
+    keys = ['all', f'author:{author_id}']
+    keys.extend(
+        f'group:{group_id}' for group_id in group_ids if group_id is not None
+    )
+    return keys
+
+
+def touch_post_pages(author_id, *group_ids):
+    """Сбрасывает кеш лент, где виден пост: главная, профиль, группы."""
+    if not settings.POSTS_ANONYMOUS_PAGE_CACHE:
+        return
+    scopes = ['index']
+    scopes.extend(
+        f'profile:{username}' for username in
+        User.objects.filter(pk=author_id).values_list('username', flat=True)
+    )
+    scopes.extend(
+        f'group:{slug}' for slug in
+        Group.objects.filter(pk__in=[pk for pk in group_ids if pk])
+        .values_list('slug', flat=True)
+    )
+    touch_scopes(*scopes)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_relations(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    # Новый загруженный файл еще не сохранен в хранилище; картинке,
+    # заданной именем (импорт, генерация), миниатюры создает
+    # команда generate_thumbnails.
+    instance._image_uploaded = bool(
+        instance.image and not instance.image._committed)
+    if instance._state.adding:
+        return
+    if not (hasattr(instance, '_loaded_group_id')
+            and hasattr(instance, '_loaded_author_id')):
+        instance._loaded_group_id, instance._loaded_author_id = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'author_id')
+            .first()
+        ) or (None, None)
+
+
+def post_moved(post):
+    """Счетчики правленого поста, если он сменил группу или автора."""
+    old_group_id = post._loaded_group_id
+    old_author_id = post._loaded_author_id
+    if old_author_id != post.author_id:
+        change_author_count(old_author_id, -1)
+        change_author_count(post.author_id, 1)
+    else:
+        change_author_count(post.author_id)
+    if old_group_id != post.group_id:
+        change_group_count(old_group_id, -1)
+        change_group_count(post.group_id, 1)
+    else:
+        change_group_count(post.group_id)
+    if (old_author_id, old_group_id) != (post.author_id, post.group_id):
+        invalidate_counts(
+            *count_keys(post.author_id, old_group_id, post.group_id),
+            f'author:{old_author_id}')
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        change_author_count(instance.author_id, 1)
+        change_group_count(instance.group_id, 1)
+        invalidate_counts(*count_keys(instance.author_id, instance.group_id))
+    else:
+        post_moved(instance)
+        invalidate_fragments([instance.pk])
+    old_author_id = getattr(instance, '_loaded_author_id', None)
+    if old_author_id not in (None, instance.author_id):
+        touch_post_pages(old_author_id, instance._loaded_group_id)
+    touch_post_pages(
+        instance.author_id,
+        getattr(instance, '_loaded_group_id', None),
+        instance.group_id
+    )
+    instance._loaded_group_id = instance.group_id
+    instance._loaded_author_id = instance.author_id
+    if getattr(instance, '_image_uploaded', False):
+        schedule_thumbnails(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_author_count(instance.author_id, -1)
+    change_group_count(instance.group_id, -1)
+    invalidate_counts(*count_keys(instance.author_id, instance.group_id))
+    invalidate_fragments([instance.pk])
+    touch_post_pages(instance.author_id, instance.group_id)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw, **kwargs):
+    if raw or created:
+        return
+    group_by_slug.invalidate(instance.pk)
+    if settings.POSTS_ANONYMOUS_PAGE_CACHE:
+        touch_scopes(GLOBAL_SCOPE)
+    Group.objects.filter(pk=instance.pk).update(posts_changed=timezone.now())
+    # Посты группы есть в профилях многих авторов: вместо отметки
+    # у каждого - общая отметка правок (см. FeedStats).
+    touch_feed()
+    touch_fragments('group', instance.pk)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw, update_fields, **kwargs):
+    # Вход пользователя обновляет только last_login - карточки не меняются.
+    if raw or created or update_fields == frozenset({'last_login'}):
+        return
+    author_by_username.invalidate(instance.pk)
+    if settings.POSTS_ANONYMOUS_PAGE_CACHE:
+        touch_scopes(GLOBAL_SCOPE)
+    AuthorStats.objects.filter(pk=instance.pk).update(
+        posts_changed=timezone.now())
+    touch_feed()
+    touch_fragments('author', instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    group_by_slug.invalidate(instance.pk)
+    touch_feed()
+
+
+@receiver(post_delete, sender=AuthorStats)
+def author_stats_deleted(sender, instance, **kwargs):
+    # Отметка posts_changed автора уходит вместе со строкой.
+    touch_feed()
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    author_by_username.invalidate(instance.pk)
+
+
+@receiver(post_migrate)
+def lookups_migrated(sender, **kwargs):
+    # flush в тестах тоже шлет post_migrate: строки с теми же slug
+    # появятся заново с другими id.
+    clear_lookups()
@@ -0,0 +1,72 @@
+from django import template
+from django.template.loader import render_to_string
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from ..cache import get_fragments, set_fragment
+from ..thumbnails import cached_thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """
+    Карточка поста ленты из кеша. При первом вызове за отрисовку
+    все карточки текущей page_obj запрашиваются из кеша разом,
+    а для недостающих - так же разом миниатюры картинок.
+    """
+    fragments = context.render_context.get('post_fragments')
+    if fragments is None:
+        page = context.get('page_obj')
+        posts = list(page) if page is not None else [post]
+        fragments, versions = get_fragments(posts)
+        context.render_context['post_fragments'] = fragments
+        context.render_context['post_fragment_versions'] = versions
+        context.render_context['post_thumbnails'] = cached_thumbnails(
+            [post for post in posts if post.pk not in fragments], 'feed')
+    html = fragments.get(post.pk)
+    if html is None:
+        html = render_to_string('includes/post_card.html', {
+            'post': post,
+            'thumbnails': context.render_context['post_thumbnails'],
+        })
+        version = context.render_context['post_fragment_versions'].get(
+            post.pk)
+        if version is not None:
+            set_fragment(post, html, version)
+    return mark_safe(html)
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """
+    Ссылка на другую страницу с сохранением параметров запроса
+    (например, ?q= поиска): {% page_url page=2 %}.
+    """
+    query = context['request'].GET.copy()
+    for name in ('page', 'cursor'):
+        query.pop(name, None)
+    for name, value in params.items():
+        query[name] = value
+    return '?' + query.urlencode()
+
+
+@register.simple_tag
+def post_image(post, size, thumbnails=None):
+    """
+    <img> картинки поста: готовая миниатюра размера size или, пока
+    пул ее не создал, исходная картинка. thumbnails - уже найденные
+    миниатюры страницы (см. post_card). Картинка здесь не читается.
+    """
+    if not post.image:
+        return ''
+    if thumbnails is None:
+        thumbnails = cached_thumbnails([post], size)
+    thumbnail = thumbnails.get(post.pk)
+    if thumbnail is None:
+        return format_html(
+            '<img class="card-img my-2" src="{}" alt="">', post.image.url)
+    return format_html(
+        '<img class="card-img my-2" src="{}" width="{}" height="{}" alt="">',
+        thumbnail.url, thumbnail.width, thumbnail.height)
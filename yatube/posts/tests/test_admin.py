@@ -0,0 +1,237 @@
+from http import HTTPStatus
+from unittest import mock
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from ..admin import EXCERPT_LENGTH
+from ..counters import change_group_counts
+from ..models import AuthorStats, Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {n}', slug=f'group-{n}', description='-')
+            for n in range(3)
+        ]
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+        cache.clear()
+
+    def add_posts(self, number):
+        start = Post.objects.count()
+        authors = [
+            User.objects.create_user(username=f'author{start + n}')
+            for n in range(number)
+        ]
+        Post.objects.bulk_create([
+            Post(
+                author=author,
+                text='Длинный текст поста. ' * 50,
+                group=self.groups[n % len(self.groups)]
+            )
+            for n, author in enumerate(authors)
+        ])
+
+    def changelist_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.admin_client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Авторы и варианты групп не запрашиваются для каждой строки."""
+        self.add_posts(2)
+        few = self.changelist_queries()
+        self.add_posts(20)
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_changelist_shows_excerpt(self):
+        """В списке только начало текста поста."""
+        self.add_posts(1)
+        response = self.admin_client.get(self.url)
+        text = Post.objects.get().text
+        self.assertContains(response, text[:EXCERPT_LENGTH] + '…')
+        self.assertNotContains(response, text.strip())
+
+    def test_search_finds_every_matching_post(self):
+        """Поиск в списке находит все подходящие посты, а не один."""
+        self.add_posts(3)
+        Post.objects.filter(pk=Post.objects.last().pk).update(text='Другое')
+        response = self.admin_client.get(self.url, {'q': 'текст'})
+        self.assertEqual(response.context['cl'].result_count, 2)
+
+    def test_changelist_keeps_chosen_order(self):
+        """Страница списка идет в порядке выбранной сортировки."""
+        self.add_posts(3)
+        response = self.admin_client.get(self.url, {'o': '3'})
+        self.assertEqual(
+            [post.pk for post in response.context['cl'].result_list],
+            sorted(Post.objects.values_list('pk', flat=True))
+        )
+
+    def test_changelist_edits_group(self):
+        """Смена группы из списка не обрезает текст поста."""
+        self.add_posts(1)
+        post = Post.objects.get()
+        response = self.admin_client.post(self.url, {
+            'form-TOTAL_FORMS': 1,
+            'form-INITIAL_FORMS': 1,
+            'form-0-id': post.pk,
+            'form-0-group': self.groups[2].pk,
+            '_save': 'Сохранить',
+        })
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        edited = Post.objects.get()
+        self.assertEqual(edited.group, self.groups[2])
+        self.assertEqual(edited.text, post.text)
+
+    def test_change_author_moves_counters(self):
+        """Смена автора в форме поста переносит пост между счетчиками."""
+        old, new = (
+            User.objects.create_user(username=name) for name in ('a', 'b'))
+        post = Post.objects.create(
+            author=old, text='Пост', group=self.groups[0])
+        response = self.admin_client.post(
+            reverse('admin:posts_post_change', args=(post.pk,)), {
+                'text': post.text,
+                'author': new.pk,
+                'group': self.groups[0].pk,
+            })
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertEqual(Post.objects.get().author, new)
+        self.assertEqual(AuthorStats.objects.get(author=old).posts_count, 0)
+        self.assertEqual(AuthorStats.objects.get(author=new).posts_count, 1)
+        self.assertEqual(
+            Group.objects.get(pk=self.groups[0].pk).posts_count, 1)
+
+
+@override_settings(POSTS_BULK_CHUNK_SIZE=2)
+class PostBulkActionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.author = User.objects.create_user(username='NameTest')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='-')
+        cls.target = Group.objects.create(
+            title='Другая группа', slug='other-slug', description='-')
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+        for n in range(5):
+            Post.objects.create(
+                author=self.author, text=f'Спам {n}', group=self.group)
+        self.ids = list(Post.objects.values_list('pk', flat=True))
+
+    def act(self, action, ids=(), **data):
+        return self.admin_client.post(self.url, {
+            'action': action,
+            'index': 0,
+            ACTION_CHECKBOX_NAME: list(ids),
+            **data,
+        })
+
+    def test_move_to_group(self):
+        """Перенос в группу поправляет счетчики обеих групп."""
+        self.act('move_to_group', self.ids[:3], group=self.target.pk)
+        self.assertEqual(Post.objects.filter(group=self.target).count(), 3)
+        self.group.refresh_from_db()
+        self.target.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 2)
+        self.assertEqual(self.target.posts_count, 3)
+
+    def test_move_without_group_is_rejected(self):
+        """Без выбранной группы посты остаются на месте."""
+        self.act('move_to_group', self.ids)
+        self.assertEqual(Post.objects.filter(group=self.group).count(), 5)
+
+    def test_clear_group_across_all_pages(self):
+        """«Выбрать все» убирает из группы все отфильтрованные посты."""
+        self.admin_client.post(f'{self.url}?{urlencode({"q": "Спам"})}', {
+            'action': 'clear_group',
+            'index': 0,
+            'select_across': 1,
+            ACTION_CHECKBOX_NAME: self.ids[:1],
+        })
+        self.assertFalse(Post.objects.filter(group__isnull=False).exists())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+
+    def test_delete_across_all_pages(self):
+        """Подтверждение «выбрать все» удаляет все отфильтрованные посты."""
+        Post.objects.create(author=self.author, text='Нормальный пост')
+        url = f'{self.url}?{urlencode({"q": "Спам"})}'
+        data = {
+            'action': 'delete_posts',
+            'index': 0,
+            'select_across': 1,
+            ACTION_CHECKBOX_NAME: self.ids[:1],
+        }
+        response = self.admin_client.post(url, data)
+        self.assertContains(response, 'Будет удалено постов: 5')
+        self.admin_client.post(url, {**data, 'post': 'yes'})
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)),
+            ['Нормальный пост']
+        )
+
+    def test_delete_asks_for_confirmation(self):
+        """Удаление - после подтверждения, пачками и со счетчиками."""
+        response = self.act('delete_posts', self.ids[:4])
+        self.assertContains(response, 'Будет удалено постов: 4')
+        self.assertEqual(Post.objects.count(), 5)
+        self.act('delete_posts', self.ids[:4], post='yes')
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)),
+                         self.ids[4:])
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.author).posts_count, 1)
+        self.assertEqual(list(Post.objects.search('Спам')),
+                         list(Post.objects.all()))
+
+    def test_interrupted_action_reports_progress(self):
+        """Сбой пачки оставляет прошлые пачки и сообщает, докуда дошли."""
+        calls = []
+
+        def fail_second_chunk(deltas):
+            calls.append(deltas)
+            if len(calls) == 2:
+                raise DatabaseError('сбой')
+            change_group_counts(deltas)
+
+        with mock.patch('posts.bulk.change_group_counts',
+                        side_effect=fail_second_chunk):
+            response = self.admin_client.post(self.url, {
+                'action': 'delete_posts',
+                'index': 0,
+                ACTION_CHECKBOX_NAME: self.ids,
+                'post': 'yes',
+            }, follow=True)
+        self.assertContains(response, 'Уже обработано: 2 из 5 постов')
+        self.assertEqual(Post.objects.count(), 3)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 3)
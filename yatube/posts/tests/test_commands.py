@@ -0,0 +1,199 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..models import AuthorStats, Group, ImportCheckpoint, Post
+
+User = get_user_model()
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as source:
+            source.write(content)
+        return path
+
+    def write_jsonl(self, rows):
+        return self.write(
+            'posts.jsonl', ''.join(json.dumps(row) + '\n' for row in rows))
+
+    def import_posts(self, path, *args):
+        call_command(
+            'import_posts', path, *args, batch_size=2, stdout=StringIO())
+
+    def test_import_jsonl(self):
+        """Посты импортируются с датой, счетчиками и поиском."""
+        path = self.write_jsonl([
+            {'text': 'Перенесенный котик', 'author': 'auth',
+             'group': 'test-slug', 'pub_date': '2020-01-02T03:04:05'},
+            {'text': 'Второй пост', 'author': 'auth'},
+            {'text': 'Пост без автора', 'author': 'nobody'},
+            {'text': '', 'author': 'auth'},
+            {'text': 'Пост чужой группы', 'author': 'auth', 'group': 'none'},
+        ])
+        self.import_posts(path)
+
+        self.assertEqual(Post.objects.count(), 2)
+        post = Post.objects.get(group=self.group)
+        self.assertEqual(
+            post.pub_date,
+            timezone.make_aware(datetime(2020, 1, 2, 3, 4, 5))
+        )
+        self.assertEqual(
+            AuthorStats.objects.get(pk=self.user.pk).posts_count, 2)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(list(Post.objects.search('котик')), [post])
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_import_csv_creates_authors_and_groups(self):
+        """CSV с новыми авторами и группами при --create-*."""
+        path = self.write(
+            'posts.csv',
+            'text,author,group\n'
+            'Первый,newbie,new-group\n'
+            'Второй,newbie,\n'
+        )
+        self.import_posts(path, '--create-authors', '--create-groups')
+
+        author = User.objects.get(username='newbie')
+        self.assertFalse(author.has_usable_password())
+        group = Group.objects.get(slug='new-group')
+        self.assertEqual(group.posts_count, 1)
+        self.assertEqual(author.post_stats.posts_count, 2)
+
+    def test_resume_from_checkpoint(self):
+        """Импорт продолжается с сохраненной строки."""
+        path = self.write_jsonl([
+            {'text': f'Пост {number}', 'author': 'auth'}
+            for number in range(5)
+        ])
+        ImportCheckpoint.objects.create(name=path, rows=3, imported=3)
+
+        with self.assertRaises(CommandError):
+            self.import_posts(path)
+        self.import_posts(path, '--resume')
+
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Пост 3', 'Пост 4']
+        )
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_checkpoint_commits_with_batch(self):
+        """Сбой пачки откатывает и посты, и прогресс."""
+        path = self.write_jsonl([
+            {'text': f'Пост {number}', 'author': 'auth'}
+            for number in range(5)
+        ])
+        with mock.patch(
+                'posts.importing.change_group_counts',
+                side_effect=[None, ValueError('сбой')]):
+            with self.assertRaises(CommandError):
+                self.import_posts(path)
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(ImportCheckpoint.objects.get(name=path).rows, 2)
+
+        self.import_posts(path, '--resume')
+        self.assertEqual(Post.objects.count(), 5)
+
+
+class ExportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(5):
+            Post.objects.create(
+                author=cls.user, text=f'Пост {number}', group=cls.group)
+
+    def test_export_can_be_imported_back(self):
+        """Выгрузка в gzip загружается обратно через import_posts."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'posts.jsonl.gz')
+            call_command(
+                'export_posts', path, chunk_size=2, stdout=StringIO())
+            with gzip.open(path, 'rt', encoding='utf-8') as exported:
+                source = os.path.join(directory, 'posts.jsonl')
+                with open(source, 'w', encoding='utf-8') as target:
+                    target.write(exported.read())
+            Post.objects.all().delete()
+            call_command('import_posts', source, stdout=StringIO())
+
+        self.assertEqual(
+            list(Post.objects.order_by('pk')
+                 .values_list('text', 'author', 'group')),
+            [(f'Пост {number}', self.user.pk, self.group.pk)
+             for number in range(5)]
+        )
+
+
+class SeedTest(TestCase):
+    def seed(self, **options):
+        call_command(
+            'seed', '--until=2024-01-01', users=20, groups=5, posts=300,
+            workers=1, batch_size=100, stdout=StringIO(), **options
+        )
+        return list(
+            Post.objects.order_by('pk')
+            .values_list('text', 'author__username', 'group__slug', 'pub_date')
+        )
+
+    def test_seed_is_deterministic(self):
+        """Одно зерно - одни и те же данные, другое - другие."""
+        posts = self.seed()
+        self.assertEqual(len(posts), 300)
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertEqual(self.seed(), posts)
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.assertNotEqual(self.seed(seed=1), posts)
+
+    def test_seed_data_is_skewed_and_counted(self):
+        """Посты идут по времени, у авторов перекос, счетчики верны."""
+        posts = self.seed()
+        dates = [pub_date for *_, pub_date in posts]
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(
+            dates[-1], timezone.make_aware(datetime(2024, 1, 1)))
+        counts = sorted(
+            AuthorStats.objects.values_list('posts_count', flat=True))
+        self.assertEqual(sum(counts), 300)
+        self.assertGreater(counts[-1], 300 / 20 * 2)
+        self.assertEqual(
+            sum(Group.objects.values_list('posts_count', flat=True)),
+            Post.objects.exclude(group=None).count()
+        )
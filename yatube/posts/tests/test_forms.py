@@ -1,10 +1,31 @@
+import hashlib
+import os
+import shutil
+import tempfile
 from http import HTTPStatus
+from io import StringIO
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
 
 from ..models import Group, Post
+from ..thumbnails import cached_thumbnails
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 User = get_user_model()
 
@@ -106,3 +127,87 @@ class PostCreateFormTests(TestCase):
         self.assertEqual(Post.objects.count(), posts_count)
         redirect = '/auth/login/?next=/create/'
         self.assertRedirects(response, redirect)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_WORKERS=0)
+class PostImageTests(TransactionTestCase):
+    """Миниатюры создаются после коммита, поэтому без TestCase."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='NameTest')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_upload_generates_thumbnails(self):
+        """Загруженная картинка: миниатюры готовы, лента их показывает."""
+        self.authorized_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'),
+        })
+        post = Post.objects.get(text='Пост с картинкой')
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        self.assertEqual(post.image.name, f'posts/{digest[:2]}/{digest}.gif')
+        for size in settings.POSTS_THUMBNAIL_SIZES:
+            thumbnail = cached_thumbnails([post], size)[post.pk]
+            self.assertTrue(thumbnail.exists())
+        feed = cached_thumbnails([post], 'feed')[post.pk]
+        self.assertContains(self.client.get(reverse('posts:index')), feed.url)
+        detail = cached_thumbnails([post], 'detail')[post.pk]
+        self.assertContains(
+            self.client.get(reverse('posts:post_detail', args=(post.pk,))),
+            detail.url)
+
+    def test_duplicate_upload_shares_file(self):
+        """Повторная загрузка того же файла ссылается на сохраненный."""
+        uploads = (('Первый', 'small.gif'), ('Второй', 'copy.GIF'))
+        for text, filename in uploads:
+            self.authorized_client.post(reverse('posts:post_create'), data={
+                'text': text,
+                'image': SimpleUploadedFile(
+                    filename, SMALL_GIF, content_type='image/gif'),
+            })
+        first, second = Post.objects.filter(
+            text__in=('Первый', 'Второй')).order_by('pk')
+        self.assertEqual(first.image.name, second.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [
+            os.path.basename(first.image.name)])
+
+    def test_thumbnails_found_after_cache_loss(self):
+        """Кеш другого процесса пуст: миниатюры находятся в kvstore."""
+        self.authorized_client.post(reverse('posts:post_create'), data={
+            'text': 'Пост с картинкой',
+            'image': SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'),
+        })
+        post = Post.objects.get(text='Пост с картинкой')
+        feed = cached_thumbnails([post], 'feed')[post.pk]
+        cache.clear()
+        self.assertContains(self.client.get(reverse('posts:index')), feed.url)
+        with self.assertNumQueries(0):
+            self.assertIn(post.pk, cached_thumbnails([post], 'feed'))
+
+    def test_feed_falls_back_to_original(self):
+        """Без миниатюры лента отдает исходную картинку и не создает ее."""
+        post = Post.objects.create(
+            author=self.user, text='Импорт', image='posts/imported.gif')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.image.url)
+        self.assertEqual(cached_thumbnails([post], 'feed'), {})
+
+    def test_generate_thumbnails_command(self):
+        """Команда создает миниатюры картинкам, заданным по имени."""
+        path = tempfile.mkdtemp(dir=TEMP_MEDIA_ROOT)
+        with open(f'{path}/imported.gif', 'wb') as image:
+            image.write(SMALL_GIF)
+        name = f'{path[len(TEMP_MEDIA_ROOT) + 1:]}/imported.gif'
+        post = Post.objects.create(author=self.user, text='Импорт', image=name)
+        call_command('generate_thumbnails', workers=0, stdout=StringIO())
+        self.assertIn(post.pk, cached_thumbnails([post], 'feed'))
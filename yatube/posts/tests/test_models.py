@@ -1,7 +1,10 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..models import AuthorStats, Group, Post
 
 User = get_user_model()
 
@@ -57,3 +60,93 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     self.post._meta.get_field(field).help_text, expected_value)
+
+
+class PostCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.group2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test-slug2',
+            description='Тестовое описание 2',
+        )
+
+    def assert_counts(self, author_count, group_count, group2_count):
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count,
+            author_count
+        )
+        self.assertEqual(
+            Group.objects.get(pk=self.group.pk).posts_count, group_count)
+        self.assertEqual(
+            Group.objects.get(pk=self.group2.pk).posts_count, group2_count)
+
+    def test_counters_follow_create_edit_delete(self):
+        """Счетчики меняются при создании, смене группы и удалении поста."""
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group)
+        Post.objects.create(author=self.user, text='Пост без группы')
+        self.assert_counts(2, 1, 0)
+
+        post = Post.objects.get(pk=post.pk)
+        post.group = self.group2
+        post.save()
+        self.assert_counts(2, 0, 1)
+
+        post.text = 'Новый текст'
+        post.save()
+        self.assert_counts(2, 0, 1)
+
+        post.delete()
+        self.assert_counts(1, 0, 0)
+
+    def test_counters_follow_author_change(self):
+        """Смена автора поста переносит его между счетчиками авторов."""
+        other = User.objects.create_user(username='other')
+        post = Post.objects.create(
+            author=self.user, text='Тестовый пост', group=self.group)
+        post = Post.objects.get(pk=post.pk)
+        post.author = other
+        post.save()
+        self.assert_counts(0, 1, 0)
+        self.assertEqual(AuthorStats.objects.get(author=other).posts_count, 1)
+
+    def test_cascade_delete_of_author(self):
+        """Удаление автора каскадом не ломает счетчики групп."""
+        author = User.objects.create_user(username='cascade')
+        Post.objects.create(author=author, text='Пост', group=self.group)
+        author.delete()
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 0)
+        self.assertFalse(AuthorStats.objects.filter(pk=author.pk).exists())
+
+    def test_recount_command_fixes_drift(self):
+        """Команда recount_posts исправляет рассинхронизацию."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Пост', group=self.group)
+            for _ in range(3)
+        ])
+        call_command('recount_posts', stdout=StringIO())
+        self.assert_counts(3, 3, 0)
+
+    def test_recount_creates_many_author_stats(self):
+        """Пересчет заводит статистику авторам больше одной пачки SQLite."""
+        User.objects.bulk_create([
+            User(username=f'author{n}') for n in range(600)
+        ])
+        authors = User.objects.filter(username__startswith='author')
+        Post.objects.bulk_create([
+            Post(author=author, text='Пост') for author in authors
+        ])
+        call_command('recount_posts', stdout=StringIO())
+        self.assertEqual(
+            AuthorStats.objects.filter(author__in=authors, posts_count=1)
+            .count(),
+            600
+        )
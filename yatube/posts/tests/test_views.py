@@ -1,9 +1,26 @@
+import csv
+import gzip
+import io
+import json
+from datetime import timedelta
+from http import HTTPStatus
+from unittest import skipUnless
+
 from django import forms
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+
+from core.query_budget import get_within_budget
 
-from ..models import Group, Post
+from ..models import AuthorStats, Group, Post
+from ..utils import (
+    CachedCountPaginator, CursorPaginator, FeedPaginator, decode_cursor
+)
 
 User = get_user_model()
 
@@ -191,3 +208,473 @@ class PaginatorViewsTest(TestCase):
     def test_second_page_contains_three_records(self):
         """Проверка: на второй странице должно быть три поста."""
         self.pagination_test_setup('?page=2', NUMBER_POSTS_SECOND_PAGE)
+
+    def test_page_window_is_elided(self):
+        """Проверка: в шаблон уходит только окно номеров страниц."""
+        paginator = FeedPaginator(list(range(5000)), NUMBER_POSTS_FIRST_PAGE)
+        ellipsis = paginator.ELLIPSIS
+        self.assertEqual(
+            paginator.get_page(250).page_window,
+            [1, ellipsis, 248, 249, 250, 251, 252, ellipsis, 500]
+        )
+        self.assertEqual(
+            paginator.get_page(1).page_window, [1, 2, 3, ellipsis, 500])
+        self.assertEqual(
+            FeedPaginator(list(range(30)), 10).get_page(2).page_window,
+            [1, 2, 3]
+        )
+
+    def test_cursor_pages_walk_forward_and_back(self):
+        """Проверка: курсорная пагинация листает ленты в обе стороны."""
+        reverse_pages_names = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+        for reverse_name in reverse_pages_names:
+            with self.subTest(reverse_name=reverse_name):
+                first = self.guest_client.get(
+                    reverse_name, {'cursor': ''}).context['page_obj']
+                self.assertEqual(len(first), NUMBER_POSTS_FIRST_PAGE)
+                self.assertFalse(first.has_previous())
+
+                second = self.guest_client.get(
+                    reverse_name, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second), NUMBER_POSTS_SECOND_PAGE)
+                self.assertFalse(second.has_next())
+                self.assertFalse(
+                    set(first.object_list) & set(second.object_list))
+
+                back = self.guest_client.get(
+                    reverse_name, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(back.object_list, first.object_list)
+
+    @skipUnless(connection.vendor == 'sqlite', 'план запроса SQLite')
+    def test_cursor_page_seeks_index(self):
+        """Проверка: страница по курсору ищет по индексу, а не сканирует."""
+        paginator = CursorPaginator(
+            Post.objects.all(), NUMBER_POSTS_FIRST_PAGE)
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        for token in (first.next_cursor, second.previous_cursor):
+            with self.subTest(token=token):
+                _, queryset = paginator.seek(decode_cursor(token))
+                # С параметрами, как в запросе страницы: подставленные
+                # литералы план не показывают.
+                ids = queryset.values_list('pk', flat=True)
+                query = ids[:NUMBER_POSTS_FIRST_PAGE].query
+                sql, params = query.sql_with_params()
+                with connection.cursor() as cursor:
+                    cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                    plan = ' '.join(row[-1] for row in cursor.fetchall())
+                self.assertIn('SEARCH', plan)
+                self.assertNotIn('SCAN', plan)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Проверка: испорченный курсор отдает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'})
+        self.assertEqual(
+            len(response.context['page_obj']), NUMBER_POSTS_FIRST_PAGE)
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'Author{n}')
+            for n in range(NUMBER_POSTS_FIRST_PAGE)
+        ]
+        cls.posts = Post.objects.bulk_create(
+            [
+                Post(
+                    text=f'Тестовые посты номер {n}',
+                    author=author,
+                    group=cls.group
+                )
+                for n, author in enumerate(cls.authors)
+            ]
+        )
+        cls.post = Post.objects.latest('id')
+        cls.view_budgets = [
+            (reverse('posts:index'), 5),
+            (reverse('posts:group_list', kwargs={'slug': cls.group.slug}), 5),
+            (
+                reverse(
+                    'posts:profile',
+                    kwargs={'username': cls.authors[0].username}),
+                5
+            ),
+            (
+                reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+                2
+            ),
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_feed_views_stay_within_query_budget(self):
+        """Ленты не делают отдельных запросов за автором и группой."""
+        for url, budget in self.view_budgets:
+            with self.subTest(url=url):
+                get_within_budget(self.guest_client, url, budget)
+
+
+@override_settings(POSTS_PAGINATOR='posts.utils.CachedCountPaginator')
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NameTest')
+        for n in range(NUMBER_POSTS):
+            Post.objects.create(text=f'Тестовый пост {n}', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_count_is_cached_and_invalidated(self):
+        """Количество постов берется из кеша и сбрасывается сигналами."""
+        url = reverse('posts:index')
+        paginator = self.guest_client.get(url).context['page_obj'].paginator
+        self.assertIsInstance(paginator, CachedCountPaginator)
+        self.assertEqual(paginator.count, NUMBER_POSTS)
+
+        # Остаются запросы валидатора ETag и выборка страницы.
+        with self.assertNumQueries(3):
+            self.guest_client.get(url)
+
+        Post.objects.create(text='Еще один пост', author=self.user)
+        paginator = self.guest_client.get(url).context['page_obj'].paginator
+        self.assertEqual(paginator.count, NUMBER_POSTS + 1)
+
+    @override_settings(POSTS_COUNT_APPROXIMATE_ABOVE=1)
+    def test_large_table_uses_estimate(self):
+        """Для всей ленты выше порога используется оценка СУБД."""
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.filter(pk=Post.objects.first().pk).delete()
+        cache.clear()
+        paginator = self.guest_client.get(
+            reverse('posts:index')).context['page_obj'].paginator
+        self.assertEqual(paginator.count, NUMBER_POSTS)
+
+
+class PostFragmentCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NameTest')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост для теста',
+            group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.feeds = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        ]
+
+    def test_feeds_share_cached_fragment(self):
+        """Карточка поста кешируется одна на все ленты."""
+        self.guest_client.get(self.feeds[0])
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        for url in self.feeds:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, self.post.text)
+
+    def test_fragment_invalidated_by_related_edits(self):
+        """Правка поста, группы и автора сбрасывает карточку."""
+        self.guest_client.get(self.feeds[0])
+        self.post.text = 'Отредактированный текст'
+        self.post.save()
+        self.group.title = 'Новое название группы'
+        self.group.save()
+        self.user.first_name = 'Лев'
+        self.user.save()
+        response = self.guest_client.get(self.feeds[0])
+        for text in ('Отредактированный текст', 'Новое название группы',
+                     'Лев'):
+            with self.subTest(text=text):
+                self.assertContains(response, text)
+
+    def test_related_edits_do_not_touch_every_post(self):
+        """Правка группы и автора не перебирает их посты."""
+        Post.objects.bulk_create([
+            Post(author=self.user, text=f'Пост {n}', group=self.group)
+            for n in range(20)
+        ])
+        # Первая правка заводит строку FeedStats.
+        self.group.save()
+        with CaptureQueriesContext(connection) as many:
+            self.group.save()
+            self.user.save()
+        Post.objects.exclude(pk=self.post.pk).delete()
+        with CaptureQueriesContext(connection) as one:
+            self.group.save()
+            self.user.save()
+        self.assertEqual(len(many), len(one))
+
+
+@override_settings(POSTS_ANONYMOUS_PAGE_CACHE=True)
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NameTest')
+        cls.other = User.objects.create_user(username='OtherName')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост для теста',
+            group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.index = reverse('posts:index')
+        self.other_profile = reverse(
+            'posts:profile', kwargs={'username': self.other})
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный запрос анонима отдается из кеша."""
+        self.guest_client.get(self.index)
+        # Выполняется только запрос валидатора ETag.
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(self.index)
+        self.assertContains(response, self.post.text)
+
+    def test_authorized_user_bypasses_cache(self):
+        """Авторизованный пользователь кеш не использует."""
+        self.guest_client.get(self.index)
+        response = self.authorized_client.get(self.index)
+        self.assertIsNotNone(response.context)
+
+    def test_new_post_invalidates_only_affected_pages(self):
+        """Новый пост сбрасывает главную, но не чужой профиль."""
+        self.guest_client.get(self.index)
+        self.guest_client.get(self.other_profile)
+        Post.objects.create(author=self.user, text='Свежий пост')
+
+        self.assertContains(self.guest_client.get(self.index), 'Свежий пост')
+        with self.assertNumQueries(1):
+            self.guest_client.get(self.other_profile)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NameTest')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Тестовый пост для теста',
+            group=cls.group
+        )
+        cls.urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """Повторный запрос с тем же ETag получает 304 без шаблонов."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('Last-Modified'))
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertFalse(response.templates)
+
+    def test_post_edit_changes_validator(self):
+        """Правка поста меняет ETag во всех лентах и на странице поста."""
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        self.post.text = 'Отредактированный текст'
+        self.post.save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_group_edit_changes_author_validator(self):
+        """Правка группы меняет ETag профиля ее автора."""
+        url = reverse('posts:profile', kwargs={'username': self.user})
+        AuthorStats.objects.update(
+            posts_changed=timezone.now() - timedelta(hours=1))
+        etag = self.guest_client.get(url)['ETag']
+        self.group.title = 'Новое название группы'
+        self.group.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'Новое название группы')
+
+    def test_author_delete_does_not_move_index_back(self):
+        """Удаление последнего автора не возвращает старую отметку."""
+        newest = User.objects.create_user(username='Newest')
+        Post.objects.create(author=newest, text='Пост удаляемого автора')
+        hour_ago = timezone.now() - timedelta(hours=1)
+        AuthorStats.objects.update(posts_changed=hour_ago - timedelta(1))
+        AuthorStats.objects.filter(author=newest).update(
+            posts_changed=hour_ago)
+        Group.objects.update(posts_changed=None)
+        index = reverse('posts:index')
+        last_modified = self.guest_client.get(index)['Last-Modified']
+        newest.delete()
+        response = self.guest_client.get(
+            index, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotContains(response, 'Пост удаляемого автора')
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NameTest')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Котики и собаки',
+        )
+        cls.relevant_post = Post.objects.create(
+            author=cls.user,
+            text='Котики, котики и еще раз котики',
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Про котиков, часть {n}')
+            for n in range(NUMBER_POSTS)
+        ])
+        cls.url = reverse('posts:search')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(self.url, {'q': query, **params})
+        return list(response.context['page_obj'])
+
+    def test_search_ranks_results(self):
+        """Поиск находит формы слова, релевантные посты первыми."""
+        posts = self.search('котик')
+        self.assertEqual(posts[0], self.relevant_post)
+        self.assertEqual(len(posts), NUMBER_POSTS_FIRST_PAGE)
+        self.assertEqual(self.search('собаки'), [self.post])
+        self.assertEqual(self.search('собаки"*('), [self.post])
+        self.assertEqual(self.search(''), [])
+
+    def test_search_index_follows_edits(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Только хомяки'
+        post.save()
+        self.assertEqual(self.search('собаки'), [])
+        self.assertEqual(self.search('хомяки'), [post])
+        post.delete()
+        self.assertEqual(self.search('хомяки'), [])
+
+    def test_paginator_keeps_query(self):
+        """Ссылки на страницы результатов сохраняют запрос."""
+        response = self.guest_client.get(self.url, {'q': 'котик'})
+        self.assertContains(
+            response, '?q=%D0%BA%D0%BE%D1%82%D0%B8%D0%BA&amp;page=2')
+        posts = self.search('котик', page=2)
+        self.assertEqual(
+            len(posts), NUMBER_POSTS + 2 - NUMBER_POSTS_FIRST_PAGE)
+
+    @override_settings(POSTS_SEARCH_RANK_LIMIT=5)
+    def test_too_many_matches_are_capped(self):
+        """Сверх лимита совпадений - самые новые посты без ранжирования."""
+        response = self.guest_client.get(self.url, {'q': 'котик'})
+        page_obj = response.context['page_obj']
+        self.assertTrue(response.context['too_many'])
+        self.assertEqual(page_obj.paginator.count, 5)
+        self.assertEqual(
+            list(page_obj),
+            list(Post.objects.order_by('-id')[:5])
+        )
+
+
+class PostExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NameTest')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(NUMBER_POSTS):
+            Post.objects.create(
+                author=cls.user, text=f'Пост {number}', group=cls.group)
+        cls.url = reverse('posts:export')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.staff_client = Client()
+        self.staff_client.force_login(self.staff)
+
+    def test_export_is_staff_only(self):
+        """Выгрузка недоступна обычным пользователям."""
+        response = self.authorized_client.get(self.url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    @override_settings(POSTS_BULK_CHUNK_SIZE=5)
+    def test_export_streams_all_posts(self):
+        """Выгрузка отдает все посты потоком, в том числе в gzip."""
+        response = self.staff_client.get(self.url, {'format': 'csv'})
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(
+            io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), NUMBER_POSTS)
+        self.assertEqual(rows[0]['author'], 'NameTest')
+        self.assertEqual(rows[0]['group'], 'test-slug')
+
+        response = self.staff_client.get(self.url, {'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(
+            b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            list(Post.objects.order_by('pk').values_list('pk', flat=True))
+        )
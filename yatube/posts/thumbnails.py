@@ -0,0 +1,153 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.models import KVStore
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+# Посты, отданные пулу и еще не обработанные: повторно не ставятся.
+_pending = set()
+_pending_lock = threading.Lock()
+# Сколько секунд помнить, что миниатюры в kvstore нет: создавший ее
+# процесс перезапишет запись, но в чужом кеше процесса промах живет
+# до истечения.
+MISS_TIMEOUT = 60
+
+
+class NamingThumbnailBackend(ThumbnailBackend):
+    """ThumbnailBackend, который умеет назвать миниатюру, не создавая ее."""
+
+    def thumbnail_file(self, file_, geometry_string, **options):
+        # Опции дополняются так же, как в get_thumbnail, иначе имя
+        # миниатюры не совпадет с созданной.
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = NamingThumbnailBackend()
+
+
+def cached_thumbnails(posts, size):
+    """
+    Готовые миниатюры картинок постов размера size из
+    POSTS_THUMBNAIL_SIZES: {post_id: ImageFile}. Смотрит кеш kvstore
+    sorl одним get_many, а ключи, которых в кеше нет, - одним запросом
+    к таблице kvstore, и дописывает найденное в кеш. Картинки не
+    читаются; пост без миниатюры в ответ не попадает.
+    """
+    geometry, options = settings.POSTS_THUMBNAIL_SIZES[size]
+    keys = {
+        add_prefix(backend.thumbnail_file(
+            post.image, geometry, **options).key): post.pk
+        for post in posts if post.image
+    }
+    cache = getattr(default.kvstore, 'cache', None)
+    if cache is None:
+        found = {key: default.kvstore._get_raw(key) for key in keys}
+    else:
+        found = cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            found.update(load_thumbnails(cache, missing))
+    return {
+        keys[key]: deserialize_image_file(value)
+        for key, value in found.items()
+        # cached_db kvstore кеширует и промахи - особым классом.
+        if isinstance(value, str)
+    }
+
+
+def load_thumbnails(cache, keys):
+    """
+    Записи kvstore по ключам из БД с дозаписью в кеш - и промахов
+    тоже, на MISS_TIMEOUT, чтобы не спрашивать БД на каждой отрисовке.
+    """
+    stored = dict(
+        KVStore.objects.filter(key__in=keys).values_list('key', 'value'))
+    if stored:
+        cache.set_many(stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT)
+    misses = {key: EMPTY_VALUE for key in keys if key not in stored}
+    if misses:
+        cache.set_many(misses, MISS_TIMEOUT)
+    return {**stored, **misses}
+
+
+def generate_thumbnails(image):
+    """Создает миниатюры всех размеров; уже готовые не пересоздаются."""
+    for geometry, options in settings.POSTS_THUMBNAIL_SIZES.values():
+        backend.get_thumbnail(image, geometry, **options)
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails')
+        return _executor
+
+
+def generate_for_post(post_id, close_connection=True):
+    """
+    Миниатюры картинки поста. Готовые карточки и страницы с постом
+    сбрасываются, чтобы вместо исходной картинки показать миниатюру.
+    Возвращает True, если миниатюры есть.
+    """
+    from .cache import invalidate_fragments
+    from .models import Post
+    from .signals import touch_post_pages
+
+    try:
+        post = Post.objects.only('image', 'author', 'group').filter(
+            pk=post_id).first()
+        if post is None or not post.image:
+            return False
+        generate_thumbnails(post.image)
+        invalidate_fragments([post.pk])
+        touch_post_pages(post.author_id, post.group_id)
+        return True
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+        return False
+    finally:
+        with _pending_lock:
+            _pending.discard(post_id)
+        if close_connection:
+            # У каждого потока пула свое соединение с БД.
+            connection.close()
+
+
+def schedule_thumbnails(post_id):
+    """После коммита отдает пост пулу потоков (или создает сразу)."""
+    def submit():
+        with _pending_lock:
+            if post_id in _pending:
+                return
+            _pending.add(post_id)
+        if settings.POSTS_THUMBNAIL_WORKERS:
+            executor().submit(generate_for_post, post_id)
+        else:
+            generate_for_post(post_id, close_connection=False)
+    transaction.on_commit(submit)
@@ -1,12 +1,329 @@
+import base64
+import binascii
+
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from django.utils.module_loading import import_string
+
+from .models import Post
+
+COUNT_CACHE_KEY = 'posts:count:{}'
 
 
-def paginator_page(request, queryset):
+def paginator_page(request, queryset, count_key=None):
     """
-    Make paginator for templates with queryset
+    Make paginator for templates with queryset.
+
+    ``?cursor=`` в запросе (или ``POSTS_PAGINATION = 'cursor'``)
+    переключает ленту на постраничный вывод по курсору.
+    ``count_key`` - имя выборки для кеша количества постов.
     """
-    paginator = Paginator(queryset, settings.POSTS_PER_PAGE)
+    cursor = request.GET.get('cursor')
+    if cursor is not None or settings.POSTS_PAGINATION == 'cursor':
+        paginator = CursorPaginator(queryset, settings.POSTS_PER_PAGE)
+        return paginator.get_page(cursor)
+    paginator_class = import_string(settings.POSTS_PAGINATOR)
+    if issubclass(paginator_class, CachedCountPaginator):
+        paginator = paginator_class(
+            queryset, settings.POSTS_PER_PAGE, count_key=count_key)
+    else:
+        paginator = paginator_class(queryset, settings.POSTS_PER_PAGE)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     return page_obj
+
+
+def page_ids(queryset, bottom, top):
+    """id постов страницы - по индексу ленты, без JOIN."""
+    return list(queryset.values_list('pk', flat=True)[bottom:top])
+
+
+def feed_posts():
+    """Основа второго шага страницы: посты с автором и группой."""
+    return Post.objects.for_feed()
+
+
+def fetch_page(queryset, bottom, top, base=None):
+    """
+    Страница в два шага: сначала id по индексу ленты без JOIN,
+    затем сами посты из base (по умолчанию feed_posts()) по этим id.
+    Так OFFSET идет по узкому индексу, планировщик не начинает
+    с auth_user, а условия отбора queryset (например, MATCH поиска)
+    не повторяются для десятка уже найденных id.
+    """
+    if not isinstance(queryset, QuerySet):
+        return queryset[bottom:top]
+    ids = page_ids(queryset, bottom, top)
+    if not ids:
+        return []
+    posts = (base if base is not None else feed_posts()).in_bulk(ids)
+    return [posts[pk] for pk in ids if pk in posts]
+
+
+def fetch_page_queryset(queryset, bottom, top, base=None):
+    """
+    Как fetch_page, но страница остается QuerySet в порядке queryset
+    (он нужен, например, формам списка в админке).
+    """
+    if not isinstance(queryset, QuerySet):
+        return queryset[bottom:top]
+    base = base if base is not None else feed_posts()
+    ids = page_ids(queryset, bottom, top)
+    if not ids:
+        return base.none()
+    position = Case(
+        *(When(pk=pk, then=Value(index)) for index, pk in enumerate(ids)),
+        output_field=IntegerField()
+    )
+    return base.filter(pk__in=ids).order_by(position)
+
+
+def invalidate_counts(*count_keys):
+    """Сбрасывает закешированные количества постов."""
+    cache.delete_many([COUNT_CACHE_KEY.format(key) for key in count_keys])
+
+
+def approximate_count(queryset):
+    """
+    Оценка числа строк таблицы по статистике СУБД
+    (sqlite_stat1 после ANALYZE или pg_class.reltuples).
+    Возвращает None, если оценки нет.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'sqlite':
+        sql = 'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1'
+    elif connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE relname = %s'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        return None
+    if row is None:
+        return None
+    return int(str(row[0]).split()[0])
+
+
+class FeedPage(Page):
+
+    @property
+    def page_window(self):
+        """Окно номеров страниц вокруг текущей для шаблона."""
+        return list(self.paginator.get_elided_page_range(self.number))
+
+
+class FeedPaginator(Paginator):
+    """
+    Paginator ленты: вместо полного page_range шаблону отдается
+    окно «первые, ±on_each_side вокруг текущей, последние».
+    """
+
+    ELLIPSIS = '…'
+    on_each_side = 2
+    on_ends = 1
+    fetch_page = staticmethod(fetch_page)
+
+    def page_base(self):
+        """Откуда грузить посты страницы по найденным id."""
+        return feed_posts()
+
+    def _get_page(self, *args, **kwargs):
+        return FeedPage(*args, **kwargs)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        if top + self.orphans >= self.count:
+            top = self.count
+        return self._get_page(
+            self.fetch_page(self.object_list, bottom, top, self.page_base()),
+            number, self)
+
+    def get_elided_page_range(self, number=1, on_each_side=None,
+                              on_ends=None):
+        """Как Paginator.get_elided_page_range из Django 3.2."""
+        if on_each_side is None:
+            on_each_side = self.on_each_side
+        if on_ends is None:
+            on_ends = self.on_ends
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+
+class CachedCountPaginator(FeedPaginator):
+    """
+    Paginator, который берет общее количество из кеша
+    (POSTS_COUNT_CACHE_TIMEOUT) и сбрасывает его по сигналам.
+    Для всей таблицы выше POSTS_COUNT_APPROXIMATE_ABOVE строк
+    вместо COUNT(*) используется оценка СУБД.
+    """
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True, count_key=None):
+        super().__init__(
+            object_list, per_page, orphans, allow_empty_first_page)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        key = COUNT_CACHE_KEY.format(self.count_key)
+        count = cache.get(key)
+        if count is None:
+            count = self.estimate_count()
+            if count is None:
+                count = super().count
+            cache.set(key, count, settings.POSTS_COUNT_CACHE_TIMEOUT)
+        return count
+
+    def estimate_count(self):
+        threshold = settings.POSTS_COUNT_APPROXIMATE_ABOVE
+        queryset = self.object_list
+        if threshold is None or queryset.query.where:
+            return None
+        estimate = approximate_count(queryset)
+        if estimate is None or estimate < threshold:
+            return None
+        return estimate
+
+
+class SearchPaginator(FeedPaginator):
+    """
+    Paginator результатов поиска: количество уже посчитано
+    по индексу (и ограничено), поэтому COUNT(*) не выполняется.
+    """
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count = count
+
+
+def encode_cursor(direction, post):
+    """Упаковывает позицию поста в непрозрачный токен."""
+    raw = f'{direction}|{post.pub_date.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Распаковывает токен в (направление, pub_date, id).
+    Для пустого или испорченного токена возвращает None.
+    """
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        direction, pub_date, pk = raw.decode().split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if direction not in ('next', 'prev') or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class CursorPage:
+    """Страница ленты, полученная по курсору (pub_date, id)."""
+
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self)} objects>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset-пагинация по (-pub_date, -id): без COUNT(*) и OFFSET,
+    поэтому время ответа не зависит от глубины страницы.
+    """
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+
+    def get_page(self, token):
+        direction, queryset = self.seek(decode_cursor(token))
+        posts = fetch_page(queryset, 0, self.per_page + 1)
+        has_more = len(posts) > self.per_page
+        posts = posts[:self.per_page]
+        if direction == 'prev':
+            posts.reverse()
+        if not posts:
+            return CursorPage(posts, None, None)
+
+        if direction == 'prev':
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, direction == 'next'
+        return CursorPage(
+            posts,
+            encode_cursor('next', posts[-1]) if has_next else None,
+            encode_cursor('prev', posts[0]) if has_previous else None,
+        )
+
+    def seek(self, cursor):
+        """Направление и выборка постов после курсора в его порядке."""
+        if cursor is None:
+            return 'first', self.queryset.order_by('-pub_date', '-id')
+        direction, pub_date, pk = cursor
+        # Внешнее условие только по pub_date дает СУБД границу
+        # для поиска по индексу (-pub_date, -id); без него OR
+        # читает индекс с начала, и время растет с глубиной.
+        if direction == 'next':
+            return direction, self.queryset.filter(
+                Q(pub_date__lte=pub_date)
+                & (Q(pub_date__lt=pub_date) | Q(id__lt=pk))
+            ).order_by('-pub_date', '-id')
+        return direction, self.queryset.filter(
+            Q(pub_date__gte=pub_date)
+            & (Q(pub_date__gt=pub_date) | Q(id__gt=pk))
+        ).order_by('pub_date', 'id')
@@ -1,15 +1,28 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 
+from .cache import anonymous_page_cache
+from .conditional import (
+    author_changed, conditional_page, group_changed, index_changed,
+    post_changed
+)
+from .exporting import CONTENT_TYPES, export_rows, export_stream
 from .forms import PostForm
-from .utils import paginator_page
+from .lookups import author_by_username, author_posts_count, group_by_slug
+from .search import count_matches
+from .utils import SearchPaginator, paginator_page
 
-from .models import Group, Post, User
+from .models import Post
 
 
+@conditional_page(index_changed)
+@anonymous_page_cache('index')
 def index(request):
-    posts = Post.objects.select_related("group")
-    page_obj = paginator_page(request, posts)
+    posts = Post.objects.for_feed()
+    page_obj = paginator_page(request, posts, count_key='all')
 
     template = 'posts/index.html'
     context = {
@@ -18,11 +31,13 @@ def index(request):
     return render(request, template, context)
 
 
+@conditional_page(group_changed)
+@anonymous_page_cache('group', 'slug')
 def group_posts(request, slug):
 
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.groups.filter(group=group)
-    page_obj = paginator_page(request, posts)
+    group = group_by_slug.get_or_404(slug)
+    posts = Post.objects.for_feed().filter(group=group)
+    page_obj = paginator_page(request, posts, count_key=f'group:{group.pk}')
     template = 'posts/group_list.html'
     context = {
         'group': group,
@@ -31,22 +46,29 @@ def group_posts(request, slug):
     return render(request, template, context)
 
 
+@conditional_page(author_changed)
+@anonymous_page_cache('profile', 'username')
 def profile(request, username):
 
-    users = get_object_or_404(User, username=username)
-    posts = users.posts.all()
-    page_obj = paginator_page(request, posts)
+    users = author_by_username.get_or_404(username)
+    posts = Post.objects.for_feed().filter(author=users)
+    page_obj = paginator_page(request, posts, count_key=f'author:{users.pk}')
     template = 'posts/profile.html'
     context = {
         'page_obj': page_obj,
         'author': users,
+        'posts_count': author_posts_count(page_obj, users),
     }
     return render(request, template, context)
 
 
+@conditional_page(post_changed)
 def post_detail(request, post_id):
 
-    post = Post.objects.get(id=post_id)
+    post = get_object_or_404(
+        Post.objects.for_feed().select_related('author__post_stats'),
+        id=post_id
+    )
     template = 'posts/post_detail.html'
     context = {
         'post': post,
@@ -54,10 +76,48 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def search(request):
+
+    query = request.GET.get('q', '').strip()
+    limit = settings.POSTS_SEARCH_RANK_LIMIT
+    found = count_matches(Post.objects.all(), query, limit + 1)
+    posts = Post.objects.for_feed().search(query, ranked=found <= limit)
+    paginator = SearchPaginator(
+        posts, settings.POSTS_PER_PAGE, count=min(found, limit))
+    page_obj = paginator.get_page(request.GET.get('page'))
+    template = 'posts/search.html'
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'too_many': found > limit,
+    }
+    return render(request, template, context)
+
+
+@staff_member_required
+def export(request):
+
+    fmt = request.GET.get('format')
+    if fmt not in CONTENT_TYPES:
+        fmt = 'jsonl'
+    compress = request.GET.get('gzip') == '1'
+    filename = f'posts.{fmt}'
+    content_type = CONTENT_TYPES[fmt]
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(
+        export_stream(export_rows(), fmt, compress),
+        content_type=content_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
 @login_required
 def post_create(request):
 
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
 
     if form.is_valid():
         form = form.save(commit=False)
@@ -81,7 +141,11 @@ def post_edit(request, post_id):
 
         return redirect('posts:post_detail', post.id)
 
-    form = PostForm(request.POST or None, instance=post)
+    form = PostForm(
+        request.POST or None,
+        files=request.FILES or None,
+        instance=post
+    )
 
     if form.is_valid():
         form.save()
@@ -13,6 +13,43 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 import os
 
 POSTS_PER_PAGE = 10
+# 'page' - ?page=N, 'cursor' - keyset-пагинация по (pub_date, id)
+POSTS_PAGINATION = 'page'
+# 'posts.utils.CachedCountPaginator' - количество постов из кеша
+POSTS_PAGINATOR = 'posts.utils.FeedPaginator'
+POSTS_COUNT_CACHE_TIMEOUT = 60
+# Выше этого числа строк вся лента считается по статистике СУБД
+POSTS_COUNT_APPROXIMATE_ABOVE = 100000
+POSTS_FRAGMENT_CACHE_TIMEOUT = 60 * 60
+# Кеш лент целиком для анонимных читателей. Сброс по правкам доходит
+# до всех процессов сервера, только если CACHES общий (см. ниже).
+POSTS_ANONYMOUS_PAGE_CACHE = False
+POSTS_PAGE_CACHE_TIMEOUT = 60
+# Поиск ранжирует не больше стольких совпадений; если их больше,
+# показываются первые столько постов от новых к старым.
+POSTS_SEARCH_RANK_LIMIT = 10000
+# Размер пачки для массовых действий с постами в админке.
+POSTS_BULK_CHUNK_SIZE = 500
+# Миниатюры картинок постов: размер для sorl-thumbnail и его опции.
+# Создаются заранее пулом из POSTS_THUMBNAIL_WORKERS потоков после
+# сохранения поста; 0 - сразу в том же потоке после коммита.
+POSTS_THUMBNAIL_SIZES = {
+    'feed': ('960x339', {'crop': 'center', 'quality': 85}),
+    'detail': ('960', {'upscale': False, 'quality': 90}),
+}
+POSTS_THUMBNAIL_WORKERS = 2
+# Группы по slug и авторы по username кешируются в памяти процесса:
+# не больше POSTS_LOOKUP_CACHE_SIZE записей на кеш, каждая живет
+# POSTS_LOOKUP_CACHE_TIMEOUT секунд (правки из других процессов видны
+# не позже). 0 выключает кеш.
+POSTS_LOOKUP_CACHE_SIZE = 1024
+POSTS_LOOKUP_CACHE_TIMEOUT = 60
+# Замеры каждого запроса: строка JSON в лог core.instrumentation
+# и заголовок Server-Timing. В заголовке есть текст запросов и имена
+# шаблонов, поэтому его получают только сотрудники и INTERNAL_IPS.
+INSTRUMENT_REQUESTS = False
+# Сколько самых долгих шаблонов и тегов попадает в эту строку лога.
+INSTRUMENT_TEMPLATES_LIMIT = 10
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -30,6 +67,19 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Профилирование живых запросов: PROFILE_REQUESTS включает middleware,
+# профилируется в среднем каждый PROFILE_SAMPLE_RATE-й запрос
+# (0 - только по заголовку) и любой запрос сотрудника с заголовком
+# PROFILE_HEADER. Дампы кладутся в PROFILE_DIR/<view>, по каждому view
+# хранится не больше PROFILE_KEEP последних. Сводка - profile_report.
+PROFILE_REQUESTS = False
+PROFILE_SAMPLE_RATE = 1000
+PROFILE_HEADER = 'X-Profile'
+PROFILE_ENGINES = ('cprofile', 'sampler')
+PROFILE_SAMPLER_INTERVAL = 0.001
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILE_KEEP = 200
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
 
@@ -57,6 +107,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'sorl.thumbnail',
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
@@ -65,23 +116,38 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
 
+    'core.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.MediaFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Без DEBUG шаблоны компилируются один раз на процесс и берутся
+# из кеша загрузчика; в разработке правки видны без перезапуска.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if not DEBUG:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+    ]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -94,6 +160,9 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'yatube.wsgi.application'
+# Прогрев при импорте yatube.wsgi (core.warmup): с preload-сервером
+# (gunicorn --preload) он выполняется один раз до fork воркеров.
+WARMUP_ON_LOAD = not DEBUG
 
 
 # Database
@@ -106,6 +175,38 @@ DATABASES = {
     }
 }
 
+# Кеши лент и карточек, количества постов, версии областей страниц
+# и kvstore миниатюр sorl сбрасываются сигналами в том процессе,
+# который обработал правку, поэтому кеш должен быть общим для всех
+# процессов сервера. У LocMemCache он свой в каждом процессе - это
+# годится только для разработки; без DEBUG кеш файловый и общий
+# для процессов одной машины, а нескольким машинам нужен memcached
+# или redis.
+# По умолчанию FileBasedCache держит 300 записей - меньше, чем карточек
+# на нескольких десятках страниц. Места хватает на карточки постов,
+# прочитанных за POSTS_FRAGMENT_CACHE_TIMEOUT, страницы анонимов,
+# количества и kvstore миниатюр. Переполненный кеш удаляет
+# 1/CULL_FREQUENCY случайных записей; пропавшая версия области или
+# карточек заводится заново и лишь сбрасывает их кеш. Больше не
+# стоит: FileBasedCache просматривает каталог при каждой записи.
+CACHE_MAX_ENTRIES = 20000
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if not DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'cache'),
+            'OPTIONS': {
+                'MAX_ENTRIES': CACHE_MAX_ENTRIES,
+                'CULL_FREQUENCY': 4,
+            },
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -149,3 +250,31 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Загрузки хранятся под хешем содержимого: повторная загрузка того же
+# файла не занимает места, а MediaFilesMiddleware отдает такие файлы
+# с кешированием на год. Большие загрузки пишутся на диск с подсчетом
+# хеша во FILE_UPLOAD_TEMP_DIR и переносятся на место переименованием.
+# Миниатюры sorl называются по своему, поэтому у них обычное хранилище.
+DEFAULT_FILE_STORAGE = 'core.storage.ContentAddressedStorage'
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'core.uploads.HashingFileUploadHandler',
+]
+FILE_UPLOAD_TEMP_DIR = os.path.join(MEDIA_ROOT, '.uploads')
+MEDIA_SERVE = True
+MEDIA_MAX_AGE = 60
+# Сколько immutable загрузок MediaFilesMiddleware помнит с заголовками.
+MEDIA_FILES_CACHED = 1024
+# Без DEBUG collectstatic кладет в STATIC_ROOT файлы с хешем содержимого
+# в имени и заранее сжатые .gz/.br, а StaticFilesMiddleware отдает их
+# с кешированием на год. Файлы без хеша кешируются STATICFILES_MAX_AGE
+# секунд.
+if not DEBUG:
+    STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+STATICFILES_SERVE = not DEBUG
+STATICFILES_MAX_AGE = 60